@@ -3,11 +3,15 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.generic import CreateView
+from django.db.models import Count, Sum
 from django.urls import reverse_lazy
 from .forms import CustomUserCreationForm, CustomAuthenticationForm
 from .models import User
 from bookings.models import Booking
 
+# Most recent bookings listed on the profile page
+PROFILE_RECENT_BOOKINGS = 10
+
 class RegisterView(CreateView):
     model = User
     form_class = CustomUserCreationForm
@@ -50,8 +54,11 @@ def logout_view(request):
 
 @login_required
 def profile_view(request):
-    bookings = Booking.objects.filter(user=request.user).select_related('flight').order_by('-created_at')
+    bookings = Booking.objects.filter(user=request.user)
+    totals = bookings.aggregate(count=Count('id'), spent=Sum('total_amount'))
     return render(request, 'accounts/profile.html', {
         'user': request.user,
-        'bookings': bookings
-    })
+        'bookings': bookings.select_related('flight').order_by('-created_at')[:PROFILE_RECENT_BOOKINGS],
+        'booking_total': totals['count'],
+        'total_spent': totals['spent'] or 0,
+    })
\ No newline at end of file
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Booking, Passenger, Payment
+from .models import (AirlineSales, ArchivedBooking, ArchivedPassenger, ArchivedPayment, Booking, DailySales,
+                     FlightSales, Passenger, Payment, PaymentJob, RouteSales, SeatHold)
 
 class PassengerInline(admin.TabularInline):
     model = Passenger
@@ -47,4 +48,78 @@ class PaymentAdmin(admin.ModelAdmin):
     list_display = ('transaction_id', 'booking', 'amount', 'payment_method', 'status', 'created_at')
     list_filter = ('status', 'payment_method', 'created_at')
     search_fields = ('transaction_id', 'booking__confirmation_code')
-    readonly_fields = ('created_at', 'processed_at')
\ No newline at end of file
+    readonly_fields = ('created_at', 'processed_at')
+
+@admin.register(SeatHold)
+class SeatHoldAdmin(admin.ModelAdmin):
+    list_display = ('flight', 'user', 'seats', 'seat_numbers', 'expires_at')
+    search_fields = ('flight__flight_number', 'user__email')
+    readonly_fields = ('created_at',)
+
+@admin.register(PaymentJob)
+class PaymentJobAdmin(admin.ModelAdmin):
+    list_display = ('payment', 'run_after', 'attempts', 'claimed_by', 'claimed_until')
+    search_fields = ('payment__transaction_id',)
+    readonly_fields = ('created_at',)
+
+class ArchivedPassengerInline(admin.TabularInline):
+    model = ArchivedPassenger
+    extra = 0
+    can_delete = False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class ArchivedPaymentInline(admin.StackedInline):
+    model = ArchivedPayment
+    extra = 0
+    can_delete = False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(admin.ModelAdmin):
+    list_display = ('confirmation_code', 'user', 'flight', 'status', 'total_amount', 'created_at', 'archived_at')
+    list_filter = ('status',)
+    search_fields = ('confirmation_code', 'user__email', 'flight__flight_number')
+    inlines = [ArchivedPassengerInline, ArchivedPaymentInline]
+    ordering = ('-created_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+class SalesRollupAdmin(admin.ModelAdmin):
+    """Rollups are maintained by bookings.rollups and rebuilt by reconcile_sales, never edited by hand"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(DailySales)
+class DailySalesAdmin(SalesRollupAdmin):
+    list_display = ('date', 'bookings', 'seats', 'revenue')
+    date_hierarchy = 'date'
+
+@admin.register(FlightSales)
+class FlightSalesAdmin(SalesRollupAdmin):
+    list_display = ('flight', 'bookings', 'seats', 'revenue')
+    list_select_related = ('flight',)
+    search_fields = ('flight__flight_number',)
+
+@admin.register(AirlineSales)
+class AirlineSalesAdmin(SalesRollupAdmin):
+    list_display = ('airline', 'bookings', 'seats', 'revenue')
+
+@admin.register(RouteSales)
+class RouteSalesAdmin(SalesRollupAdmin):
+    list_display = ('origin', 'destination', 'bookings', 'seats', 'revenue')
+    search_fields = ('origin', 'destination')
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedBooking, ArchivedPassenger, ArchivedPayment, Booking, Passenger, Payment
+
+# Bookings moved per archival transaction
+ARCHIVE_BATCH_SIZE = 500
+
+# Statuses a booking can no longer leave, and so may be archived
+ARCHIVABLE_STATUSES = ('completed', 'cancelled')
+
+
+def _copy(instance, model):
+    """Unsaved model instance with the values of every field the two models share"""
+    fields = {field.attname for field in model._meta.concrete_fields}
+    return model(**{field.attname: getattr(instance, field.attname)
+                    for field in instance._meta.concrete_fields if field.attname in fields})
+
+
+def archivable_bookings(before=None):
+    """Finished bookings whose flight departed before the retention horizon"""
+    if before is None:
+        before = timezone.localdate() - timedelta(days=settings.BOOKING_ARCHIVE_AFTER_DAYS)
+    return Booking.objects.filter(status__in=ARCHIVABLE_STATUSES, flight__departure_date__lt=before).exclude(
+        payment__job__isnull=False)
+
+
+def archive_batch(before=None, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move one batch of archivable bookings, with their passengers and
+    payments, into the archive tables. Returns the number of bookings moved.
+
+    Each batch is one transaction of a fixed number of statements: a bulk
+    INSERT per archive table and a DELETE per hot table. Passengers and
+    payments are streamed with iterator() rather than loaded all at once.
+    Ids are kept, so links to an archived booking still resolve.
+    """
+    with transaction.atomic():
+        batch = archivable_bookings(before).order_by('created_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            batch = batch.select_for_update(skip_locked=True, of=('self',))
+        bookings = list(batch[:batch_size])
+        if not bookings:
+            return 0
+        ids = [booking.id for booking in bookings]
+        ArchivedBooking.objects.bulk_create([_copy(booking, ArchivedBooking) for booking in bookings])
+        ArchivedPassenger.objects.bulk_create(
+            (_copy(passenger, ArchivedPassenger)
+             for passenger in Passenger.objects.filter(booking_id__in=ids).iterator(chunk_size=batch_size)),
+            batch_size=batch_size,
+        )
+        ArchivedPayment.objects.bulk_create(
+            (_copy(payment, ArchivedPayment)
+             for payment in Payment.objects.filter(booking_id__in=ids).iterator(chunk_size=batch_size)),
+            batch_size=batch_size,
+        )
+        # Cascades to the passengers, payments and idempotency keys.
+        Booking.objects.filter(id__in=ids).delete()
+    return len(bookings)
@@ -0,0 +1,84 @@
+import threading
+
+from django.db import transaction
+from django.db.models import F
+
+CODE_PREFIX = 'SB'
+CODE_LENGTH = 8
+CODE_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+CODE_SPACE = len(CODE_ALPHABET) ** CODE_LENGTH
+
+# Sequence numbers are scattered over the code space by n * MULTIPLIER +
+# OFFSET modulo CODE_SPACE. The multiplier shares no factor with 36, so
+# this is a bijection: distinct sequence numbers never give the same code.
+CODE_MULTIPLIER = 1743541808669
+CODE_OFFSET = 917504433491
+
+# Sequence numbers each process reserves from the database at a time
+BLOCK_SIZE = 1000
+
+SEQUENCE_NAME = 'confirmation_code'
+
+
+def encode_confirmation_code(number):
+    """Map a sequence number to a 10-character code such as SB4K7Q2ZMX"""
+    value = (number * CODE_MULTIPLIER + CODE_OFFSET) % CODE_SPACE
+    digits = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, len(CODE_ALPHABET))
+        digits.append(CODE_ALPHABET[digit])
+    return CODE_PREFIX + ''.join(reversed(digits))
+
+
+class SequenceBlocks:
+    """
+    Hands out numbers from a named CodeSequence, BLOCK_SIZE at a time.
+
+    Only the first number of each block costs a query. A block reserved
+    inside a transaction is not reused until that transaction commits, so
+    a rollback, which also undoes the reservation, can never lead to the
+    same numbers being handed out twice.
+    """
+
+    def __init__(self, name, block_size=BLOCK_SIZE):
+        self.name = name
+        self.block_size = block_size
+        self._next = self._end = 0
+        self._lock = threading.Lock()
+
+    def next_value(self):
+        with self._lock:
+            if self._next < self._end:
+                self._next += 1
+                return self._next - 1
+        start, end = self._reserve()
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._keep(start + 1, end))
+        else:
+            self._keep(start + 1, end)
+        return start
+
+    def _keep(self, start, end):
+        with self._lock:
+            if self._next >= self._end:
+                self._next, self._end = start, end
+
+    def _reserve(self):
+        from .models import CodeSequence
+
+        with transaction.atomic():
+            updated = CodeSequence.objects.filter(name=self.name).update(
+                next_value=F('next_value') + self.block_size)
+            if not updated:
+                CodeSequence.objects.get_or_create(name=self.name)
+                CodeSequence.objects.filter(name=self.name).update(next_value=F('next_value') + self.block_size)
+            end = CodeSequence.objects.filter(name=self.name).values_list('next_value', flat=True).get()
+        return end - self.block_size, end
+
+
+_confirmation_numbers = SequenceBlocks(SEQUENCE_NAME)
+
+
+def next_confirmation_code():
+    """A new booking confirmation code, without checking the database for collisions"""
+    return encode_confirmation_code(_confirmation_numbers.next_value())
@@ -1,11 +1,16 @@
+import uuid
+
 from django import forms
 from django.forms import formset_factory
 from .models import Booking, Passenger
 
+# Party sizes a booking can be made for, as on the flight search form
+MIN_PASSENGERS, MAX_PASSENGERS = 1, 9
+
 class PassengerForm(forms.ModelForm):
     class Meta:
         model = Passenger
-        fields = ['first_name', 'last_name', 'email', 'phone', 'date_of_birth', 'passport_number']
+        fields = ['first_name', 'last_name', 'email', 'phone', 'date_of_birth', 'passport_number', 'seat_number']
         widgets = {
             'first_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'First name'}),
             'last_name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Last name'}),
@@ -16,11 +21,21 @@ class PassengerForm(forms.ModelForm):
                 'class': 'form-control', 
                 'placeholder': 'Passport number (optional)'
             }),
+            'seat_number': forms.TextInput(attrs={
+                'class': 'form-control',
+                'placeholder': 'Preferred seat, e.g. 12A (optional)'
+            }),
         }
 
-PassengerFormSet = formset_factory(PassengerForm, extra=1, min_num=1, validate_min=True)
+    def clean_seat_number(self):
+        return (self.cleaned_data.get('seat_number') or '').strip().upper()
+
+PassengerFormSet = formset_factory(PassengerForm, extra=1, min_num=MIN_PASSENGERS, validate_min=True,
+                                   max_num=MAX_PASSENGERS, validate_max=True)
 
 class PaymentForm(forms.Form):
+    # Generated when the form is shown; a resubmission carries the same key
+    idempotency_key = forms.CharField(max_length=64, required=False, widget=forms.HiddenInput)
     card_number = forms.CharField(
         max_length=19,
         widget=forms.TextInput(attrs={
@@ -56,6 +71,11 @@ class PaymentForm(forms.Form):
         })
     )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.is_bound:
+            self.initial.setdefault('idempotency_key', uuid.uuid4().hex)
+
     def clean_card_number(self):
         card_number = self.cleaned_data['card_number'].replace(' ', '')
         if not card_number.isdigit() or len(card_number) < 13:
@@ -0,0 +1,40 @@
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+
+from flights.fulltext import matching, save_documents
+from .models import Booking, BookingSearchDocument, Passenger
+
+
+def booking_text(booking, passenger_names):
+    return '\n'.join([
+        booking.confirmation_code, booking.user.email, booking.user.first_name, booking.user.last_name,
+        booking.flight.flight_number, *passenger_names,
+    ])
+
+
+def index_bookings(booking_ids):
+    """Rebuild the search documents of some bookings in three queries"""
+    booking_ids = list(booking_ids)
+    bookings = Booking.objects.filter(id__in=booking_ids).select_related('user', 'flight').only(
+        'confirmation_code', 'user__email', 'user__first_name', 'user__last_name', 'flight__flight_number')
+    names = defaultdict(list)
+    for booking_id, first_name, last_name in Passenger.objects.filter(booking_id__in=booking_ids).values_list(
+            'booking_id', 'first_name', 'last_name'):
+        names[booking_id].append(f'{first_name} {last_name}')
+    save_documents(BookingSearchDocument, 'booking',
+                   {booking.id: booking_text(booking, names[booking.id]) for booking in bookings})
+
+
+def index_bookings_on_commit(booking_ids):
+    """
+    Index bookings once the current transaction commits, so passengers
+    inserted after the booking are included.
+    """
+    transaction.on_commit(partial(index_bookings, list(booking_ids)))
+
+
+def match_bookings(bookings, query):
+    """Narrow a Booking queryset to bookings whose code, customer, flight number or passengers contain query"""
+    return bookings.filter(id__in=matching(BookingSearchDocument, 'booking', query))
@@ -0,0 +1,84 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import SeatHold
+
+# Expired holds released per sweeper transaction
+SWEEP_BATCH_SIZE = 1000
+
+
+def place_hold(flight, user, count):
+    """
+    Hold count seats on a flight for a user, for SEAT_HOLD_TTL seconds.
+
+    An unexpired hold the user already has on the flight is reused when it
+    covers the same number of seats, so reloading the form does not take
+    more seats; otherwise it is released first. Returns None when the seats
+    are not available.
+    """
+    now = timezone.now()
+    hold = SeatHold.objects.filter(flight=flight, user=user, expires_at__gt=now).first()
+    if hold and hold.seats == count:
+        SeatHold.objects.filter(id=hold.id).update(expires_at=now + timedelta(seconds=settings.SEAT_HOLD_TTL))
+        return hold
+    if hold:
+        release_hold(hold)
+    seats = flight.reserve_seats(count)
+    if not seats:
+        return None
+    return SeatHold.objects.create(flight=flight, user=user, seats=count, seat_numbers=','.join(seats),
+                                   expires_at=now + timedelta(seconds=settings.SEAT_HOLD_TTL))
+
+
+def claim_hold(hold):
+    """
+    Turn an unexpired hold into booked seats by deleting it.
+
+    Returns False when the hold has expired or was already used, in which
+    case its seats belong to the sweeper and must not be booked.
+    """
+    deleted, _ = SeatHold.objects.filter(id=hold.id, expires_at__gt=timezone.now()).delete()
+    return bool(deleted)
+
+
+def release_hold(hold):
+    """Give up a hold early and return its seats to the flight"""
+    deleted, _ = SeatHold.objects.filter(id=hold.id).delete()
+    if deleted:
+        hold.flight.release_seats(hold.seats, hold.seat_list)
+
+
+def release_expired_holds(batch_size=SWEEP_BATCH_SIZE):
+    """
+    Release one batch of expired holds and return how many were released.
+
+    Holds are grouped by flight so each flight gets a single seat UPDATE and
+    each batch a single DELETE, however many holds expired. On databases
+    that support it, concurrent sweepers skip rows another one has locked.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        expired = SeatHold.objects.filter(expires_at__lte=now).select_related('flight').order_by('expires_at')
+        if connection.features.has_select_for_update_skip_locked:
+            expired = expired.select_for_update(skip_locked=True, of=('self',))
+        holds = list(expired[:batch_size])
+        if not holds:
+            return 0
+        by_flight = defaultdict(list)
+        for hold in holds:
+            by_flight[hold.flight_id].append(hold)
+        deleted, _ = SeatHold.objects.filter(id__in=[hold.id for hold in holds]).delete()
+        if deleted != len(holds):
+            # Another sweeper released some of these first; leave the rest to it.
+            transaction.set_rollback(True)
+            return 0
+        for flight_holds in by_flight.values():
+            flight_holds[0].flight.release_seats(
+                sum(hold.seats for hold in flight_holds),
+                [seat for hold in flight_holds for seat in hold.seat_list],
+            )
+    return len(holds)
@@ -0,0 +1,28 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bookings.archive import ARCHIVE_BATCH_SIZE, archive_batch
+
+
+class Command(BaseCommand):
+    help = ('Move completed and cancelled bookings whose flight departed more than '
+            'BOOKING_ARCHIVE_AFTER_DAYS days ago into the archive tables, in batches. '
+            'Run nightly from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+                            help=f'Bookings moved per transaction (default: {ARCHIVE_BATCH_SIZE}).')
+        parser.add_argument('--before', type=datetime.date.fromisoformat, metavar='YYYY-MM-DD',
+                            help='Archive flights departing before this date instead '
+                                 f'(default: {settings.BOOKING_ARCHIVE_AFTER_DAYS} days ago).')
+
+    def handle(self, *args, **options):
+        archived = 0
+        while True:
+            batch = archive_batch(options['before'], options['batch_size'])
+            archived += batch
+            if batch < options['batch_size']:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} bookings.'))
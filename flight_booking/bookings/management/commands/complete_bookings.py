@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.services import COMPLETE_BATCH_SIZE, complete_departed_bookings
+
+
+class Command(BaseCommand):
+    help = ('Mark confirmed bookings on departed flights as completed, in bounded batches, '
+            'and report throughput. Run every few minutes from cron, or keep it running with --loop.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=COMPLETE_BATCH_SIZE,
+                            help=f'Bookings updated per statement (default: {COMPLETE_BATCH_SIZE}).')
+        parser.add_argument('--pause', type=float, default=0, metavar='SECONDS',
+                            help='Sleep between batches to leave room for other writers (default: 0).')
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help='Keep running, sleeping SECONDS whenever nothing is left to complete.')
+
+    def handle(self, *args, **options):
+        while True:
+            completed, batches, slowest = 0, 0, 0.0
+            started = time.perf_counter()
+            while True:
+                batch_started = time.perf_counter()
+                batch = complete_departed_bookings(options['batch_size'])
+                slowest = max(slowest, time.perf_counter() - batch_started)
+                batches += 1
+                completed += batch
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'Batch {batches}: {batch} bookings.')
+                if batch < options['batch_size']:
+                    break
+                time.sleep(options['pause'])
+            elapsed = time.perf_counter() - started
+            if completed or options['loop'] is None:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Completed {completed} bookings in {batches} batches, {elapsed:.2f}s '
+                    f'({completed / elapsed:.0f}/s, slowest batch {slowest * 1000:.0f}ms).'
+                ))
+            if options['loop'] is None:
+                return
+            time.sleep(options['loop'])
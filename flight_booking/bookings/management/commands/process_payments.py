@@ -0,0 +1,32 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.payments import process_payment_batch
+
+
+class Command(BaseCommand):
+    help = ('Charge queued payments and confirm or cancel their bookings. '
+            'Keep it running with --loop; several workers can run side by side.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='Jobs claimed per round trip (default: 50).')
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help='Keep polling, sleeping SECONDS whenever the queue is empty.')
+        parser.add_argument('--worker-id', default=f'{socket.gethostname()}:{os.getpid()}',
+                            help='Name recorded on claimed jobs (default: host:pid).')
+
+    def handle(self, *args, **options):
+        handled = 0
+        while True:
+            batch = process_payment_batch(options['worker_id'], options['batch_size'])
+            handled += batch
+            if batch:
+                continue
+            if options['loop'] is None:
+                break
+            time.sleep(options['loop'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {handled} payment jobs.'))
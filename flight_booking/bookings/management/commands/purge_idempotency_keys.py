@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from bookings.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = ('Delete idempotency keys older than IDEMPOTENCY_KEY_TTL seconds, in batches. '
+            'Run daily from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Keys deleted per statement (default: 5000).')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+        expired = IdempotencyKey.objects.filter(created_at__lt=cutoff).order_by('created_at')
+        purged = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            IdempotencyKey.objects.filter(id__in=ids).delete()
+            purged += len(ids)
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} idempotency keys.'))
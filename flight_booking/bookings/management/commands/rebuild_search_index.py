@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from bookings.fulltext import index_bookings
+from bookings.models import Booking
+from flights.fulltext import index_flights
+from flights.models import Flight
+
+
+class Command(BaseCommand):
+    help = ('Rewrite the admin search documents of every flight and booking, in batches. '
+            'Signals keep them current; run this after bulk imports or raw SQL changes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Documents written per statement (default: 1000).')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        flights = Flight.objects.only('flight_number', 'airline', 'origin', 'destination').order_by('id')
+        batch, indexed = [], 0
+        for flight in flights.iterator(chunk_size=batch_size):
+            batch.append(flight)
+            if len(batch) >= batch_size:
+                index_flights(batch)
+                indexed, batch = indexed + len(batch), []
+        index_flights(batch)
+        self.stdout.write(f'Indexed {indexed + len(batch)} flights.')
+
+        batch, indexed = [], 0
+        for booking_id in Booking.objects.order_by('created_at', 'id').values_list('id', flat=True).iterator(
+                chunk_size=batch_size):
+            batch.append(booking_id)
+            if len(batch) >= batch_size:
+                index_bookings(batch)
+                indexed, batch = indexed + len(batch), []
+        index_bookings(batch)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed + len(batch)} bookings.'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from bookings.rollups import ROLLUPS, reconcile
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the sales rollup tables from current and archived bookings and report '
+            'any rows that had drifted. Run after deploying the rollups, then weekly from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report drift; leave the rollup tables unchanged.')
+
+    def handle(self, *args, **options):
+        drifted = 0
+        for model, keys in ROLLUPS:
+            drift = reconcile(model, keys, fix=not options['dry_run'])
+            drifted += len(drift)
+            name = model._meta.verbose_name_plural
+            if not drift:
+                self.stdout.write(f'{name.capitalize()}: no drift.')
+                continue
+            self.stdout.write(self.style.WARNING(f'{name.capitalize()}: {len(drift)} rows drifted.'))
+            for key, stored, expected in drift[:10]:
+                self.stdout.write(f'  {", ".join(map(str, key))}: bookings/seats/revenue '
+                                  f'{stored[0]}/{stored[1]}/{stored[2]} should be '
+                                  f'{expected[0]}/{expected[1]}/{expected[2]}')
+            if len(drift) > 10:
+                self.stdout.write(f'  ... and {len(drift) - 10} more')
+        if drifted and options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{drifted} rollup rows drifted; run without --dry-run to fix.'))
+        elif drifted:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt the rollups, fixing {drifted} drifted rows.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Rollups match the bookings.'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.holds import SWEEP_BATCH_SIZE, release_expired_holds
+
+
+class Command(BaseCommand):
+    help = ('Return the seats of expired seat holds to their flights. '
+            'Run every minute from cron, or keep it running with --loop.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE,
+                            help=f'Holds released per transaction (default: {SWEEP_BATCH_SIZE}).')
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help='Keep sweeping, sleeping SECONDS whenever nothing has expired.')
+
+    def handle(self, *args, **options):
+        while True:
+            released = 0
+            while True:
+                batch = release_expired_holds(options['batch_size'])
+                released += batch
+                if batch < options['batch_size']:
+                    break
+            if released:
+                self.stdout.write(self.style.SUCCESS(f'Released {released} expired seat holds.'))
+            if options['loop'] is None:
+                if not released:
+                    self.stdout.write('No expired seat holds.')
+                return
+            time.sleep(options['loop'])
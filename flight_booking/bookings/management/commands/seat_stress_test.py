@@ -0,0 +1,86 @@
+import datetime
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from django.utils import timezone
+
+from flights.models import Flight
+
+
+class Command(BaseCommand):
+    help = ('Hammer Flight.reserve_seats from many threads against a throwaway flight, '
+            'check that no seat was oversold or handed out twice and report reservations per second.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seats', type=int, default=200, help='Seats on the test flight (default: 200).')
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent workers (default: 16).')
+        parser.add_argument('--attempts', type=int, default=50,
+                            help='Booking attempts per worker (default: 50).')
+        parser.add_argument('--party-size', type=int, default=2, help='Seats per booking (default: 2).')
+
+    def handle(self, *args, **options):
+        seats, party_size = options['seats'], options['party_size']
+        if not 1 <= seats <= 500:
+            raise CommandError('--seats must be between 1 and 500.')
+
+        today = timezone.localdate()
+        flight = Flight.objects.create(
+            airline='Stress Test', flight_number=f'ST{time.time_ns() % 10 ** 12}',
+            origin='Stress Origin', destination='Stress Destination',
+            departure_date=today + datetime.timedelta(days=365),
+            arrival_date=today + datetime.timedelta(days=365),
+            departure_time=datetime.time(8), arrival_time=datetime.time(10), duration='2h 0m',
+            price=1, total_seats=seats, available_seats=seats, aircraft='Test',
+        )
+        succeeded, failed, errors = [0], [0], [0]
+        claimed = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                for _ in range(options['attempts']):
+                    try:
+                        reserved = flight.reserve_seats(party_size)
+                    except OperationalError:
+                        # SQLite reports lock timeouts instead of waiting forever.
+                        reserved = False
+                    with lock:
+                        if reserved:
+                            succeeded[0] += 1
+                            claimed.extend(reserved)
+                        elif reserved is False:
+                            errors[0] += 1
+                        else:
+                            failed[0] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        close_old_connections()
+
+        flight.refresh_from_db(fields=['available_seats', 'seat_map'])
+        sold = seats - flight.available_seats
+        taken = sum(bin(byte).count('1') for byte in bytes(flight.seat_map))
+        flight.delete()
+
+        attempts = options['threads'] * options['attempts']
+        self.stdout.write(
+            f'{attempts} attempts in {elapsed:.2f}s ({attempts / elapsed:.0f}/s): '
+            f'{succeeded[0]} booked, {failed[0]} sold out, {errors[0]} errors'
+        )
+        if sold != succeeded[0] * party_size or flight.available_seats < 0:
+            raise CommandError(f'Inventory mismatch: {sold} seats gone for {succeeded[0]} bookings.')
+        if len(set(claimed)) != len(claimed) or taken != sold:
+            raise CommandError(f'Seat map mismatch: {len(claimed)} seats handed out, '
+                               f'{len(set(claimed))} distinct, {taken} marked taken.')
+        if succeeded[0] * party_size > seats:
+            raise CommandError(f'Oversold: {succeeded[0] * party_size} seats booked of {seats}.')
+        self.stdout.write(self.style.SUCCESS(f'No overselling: {sold} of {seats} seats sold.'))
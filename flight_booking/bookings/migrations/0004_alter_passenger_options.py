@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_codesequence'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='passenger',
+            options={'ordering': ['created_at', 'id']},
+        ),
+    ]
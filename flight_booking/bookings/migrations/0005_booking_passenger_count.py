@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_alter_passenger_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='passenger_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
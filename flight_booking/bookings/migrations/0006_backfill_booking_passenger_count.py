@@ -0,0 +1,24 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_passenger_count(apps, schema_editor):
+    """Store each booking's passenger count in a single UPDATE"""
+    Booking = apps.get_model('bookings', 'Booking')
+    Passenger = apps.get_model('bookings', 'Passenger')
+
+    counts = Passenger.objects.filter(booking=OuterRef('pk')).order_by().values('booking').annotate(
+        total=Count('id')).values('total')
+    Booking.objects.update(passenger_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_booking_passenger_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_passenger_count, migrations.RunPython.noop),
+    ]
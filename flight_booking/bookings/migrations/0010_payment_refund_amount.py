@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:36
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0009_paymentjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='refund_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+    ]
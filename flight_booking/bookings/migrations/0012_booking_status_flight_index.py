@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_archivedbooking'),
+        ('flights', '0010_backfill_flight_seat_map'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'flight'], name='bookings_bo_status_86d4b3_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0012_booking_status_flight_index'),
+        ('flights', '0010_backfill_flight_seat_map'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AirlineSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bookings', models.IntegerField(default=0)),
+                ('seats', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('airline', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'airline sales',
+                'ordering': ['-revenue'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bookings', models.IntegerField(default=0)),
+                ('seats', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('date', models.DateField(help_text='Day the bookings were made', unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'daily sales',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FlightSales',
+            fields=[
+                ('bookings', models.IntegerField(default=0)),
+                ('seats', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('flight', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='flights.flight')),
+            ],
+            options={
+                'verbose_name_plural': 'flight sales',
+            },
+        ),
+        migrations.CreateModel(
+            name='RouteSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bookings', models.IntegerField(default=0)),
+                ('seats', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('origin', models.CharField(max_length=100)),
+                ('destination', models.CharField(max_length=100)),
+            ],
+            options={
+                'verbose_name_plural': 'route sales',
+                'ordering': ['-seats'],
+                'indexes': [models.Index(fields=['-seats'], name='bookings_ro_seats_67df44_idx')],
+                'constraints': [models.UniqueConstraint(fields=('origin', 'destination'), name='unique_route_sales')],
+            },
+        ),
+    ]
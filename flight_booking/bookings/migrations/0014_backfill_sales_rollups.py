@@ -0,0 +1,47 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+SOLD_STATUSES = ('confirmed', 'completed')
+
+ROLLUPS = (
+    ('DailySales', {'date': TruncDate('created_at')}),
+    ('FlightSales', {'flight_id': F('flight_id')}),
+    ('AirlineSales', {'airline': F('flight__airline')}),
+    ('RouteSales', {'origin': F('flight__origin'), 'destination': F('flight__destination')}),
+)
+
+
+def backfill_sales_rollups(apps, schema_editor):
+    """Fill each rollup table with one GROUP BY over current and archived bookings"""
+    sources = [apps.get_model('bookings', 'Booking'), apps.get_model('bookings', 'ArchivedBooking')]
+    for model_name, keys in ROLLUPS:
+        model = apps.get_model('bookings', model_name)
+        aliases = {f'key_{field}': expression for field, expression in keys.items()}
+        totals = defaultdict(lambda: [0, 0, Decimal(0)])
+        for source in sources:
+            groups = source.objects.filter(status__in=SOLD_STATUSES).order_by().values(**aliases).annotate(
+                bookings=Count('id'), seats=Sum('passenger_count'), revenue=Sum('total_amount'))
+            for group in groups:
+                total = totals[tuple(group[alias] for alias in aliases)]
+                total[0] += group['bookings']
+                total[1] += group['seats']
+                total[2] += group['revenue']
+        model.objects.bulk_create(
+            model(bookings=bookings, seats=seats, revenue=revenue, **dict(zip(keys, key)))
+            for key, (bookings, seats, revenue) in totals.items()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0013_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sales_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0014_backfill_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='bookings.booking')),
+            ],
+        ),
+    ]
@@ -0,0 +1,60 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+from flights.fulltext import drop_index_sql, index_sql
+
+BATCH_SIZE = 1000
+
+
+def build_search_index(apps, schema_editor):
+    """Write a search document for every booking, then build the full-text index over them"""
+    Booking = apps.get_model('bookings', 'Booking')
+    Passenger = apps.get_model('bookings', 'Passenger')
+    BookingSearchDocument = apps.get_model('bookings', 'BookingSearchDocument')
+
+    def write(bookings):
+        names = defaultdict(list)
+        for booking_id, first_name, last_name in Passenger.objects.filter(
+                booking__in=bookings).values_list('booking_id', 'first_name', 'last_name'):
+            names[booking_id].append(f'{first_name} {last_name}')
+        BookingSearchDocument.objects.bulk_create(
+            BookingSearchDocument(booking=booking, text='\n'.join([
+                booking.confirmation_code, booking.user.email, booking.user.first_name, booking.user.last_name,
+                booking.flight.flight_number, *names[booking.id],
+            ]))
+            for booking in bookings
+        )
+
+    batch = []
+    bookings = Booking.objects.select_related('user', 'flight').only(
+        'confirmation_code', 'user__email', 'user__first_name', 'user__last_name', 'flight__flight_number',
+    ).order_by('created_at', 'id')
+    for booking in bookings.iterator(chunk_size=BATCH_SIZE):
+        batch.append(booking)
+        if len(batch) >= BATCH_SIZE:
+            write(batch)
+            batch = []
+    write(batch)
+
+    for sql in index_sql(BookingSearchDocument._meta.db_table, schema_editor.connection.vendor):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    BookingSearchDocument = apps.get_model('bookings', 'BookingSearchDocument')
+    for sql in drop_index_sql(BookingSearchDocument._meta.db_table, schema_editor.connection.vendor):
+        schema_editor.execute(sql)
+    BookingSearchDocument.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0015_bookingsearchdocument'),
+        ('flights', '0012_flight_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_index, drop_search_index),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0016_booking_search_index'),
+        ('flights', '0013_flight_created_at_id_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='archivedbooking',
+            name='bookings_ar_user_id_8f8e14_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='bookings_bo_created_1720a2_idx',
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='bookings_ar_user_id_afbaee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['created_at', 'id'], name='bookings_ar_created_c51d49_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='bookings_bo_user_id_51c1ac_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['created_at', 'id'], name='bookings_bo_created_b97bfb_idx'),
+        ),
+    ]
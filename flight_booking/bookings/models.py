@@ -1,7 +1,9 @@
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from flights.models import Flight
+from .codes import next_confirmation_code
 import uuid
 
 class Booking(models.Model):
@@ -15,11 +17,14 @@ class Booking(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bookings')
     flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name='bookings')
+    itinerary = models.ForeignKey('Itinerary', on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='bookings')
     confirmation_code = models.CharField(max_length=10, unique=True)
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     payment_method = models.CharField(max_length=50, default='Credit Card')
     payment_reference = models.CharField(max_length=100, blank=True)
+    passenger_count = models.PositiveSmallIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -27,8 +32,10 @@ class Booking(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'status']),
+            models.Index(fields=['user', 'created_at', 'id']),
+            models.Index(fields=['status', 'flight']),
             models.Index(fields=['confirmation_code']),
-            models.Index(fields=['created_at']),
+            models.Index(fields=['created_at', 'id']),
         ]
 
     def __str__(self):
@@ -41,16 +48,7 @@ class Booking(models.Model):
 
     def generate_confirmation_code(self):
         """Generate unique confirmation code"""
-        import random
-        import string
-        while True:
-            code = 'SB' + ''.join(random.choices(string.digits, k=6))
-            if not Booking.objects.filter(confirmation_code=code).exists():
-                return code
-
-    @property
-    def passenger_count(self):
-        return self.passengers.count()
+        return next_confirmation_code()
 
 class Passenger(models.Model):
     booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='passengers')
@@ -64,7 +62,7 @@ class Passenger(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['created_at']
+        ordering = ['created_at', 'id']
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -73,6 +71,65 @@ class Passenger(models.Model):
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+class Itinerary(models.Model):
+    """Several flights booked together in one checkout, with one combined payment"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='itineraries')
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'itineraries'
+
+    def __str__(self):
+        return f"Itinerary {self.id} - {self.user.email}"
+
+class CodeSequence(models.Model):
+    """Named counter that confirmation codes are drawn from, a block at a time"""
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+class IdempotencyKey(models.Model):
+    """Key sent with a booking form, so a resubmitted form returns the original booking"""
+    key = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    itinerary = models.ForeignKey(Itinerary, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+class SeatHold(models.Model):
+    """Seats set aside for a user while they fill in the booking form"""
+    flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name='seat_holds')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='seat_holds')
+    seats = models.PositiveSmallIntegerField()
+    seat_numbers = models.CharField(max_length=200, help_text="Comma-separated seats taken by the hold")
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['expires_at']
+        indexes = [
+            models.Index(fields=['user', 'flight']),
+        ]
+
+    def __str__(self):
+        return f"{self.seats} seats on {self.flight.flight_number} for {self.user.email}"
+
+    @property
+    def seat_list(self):
+        return [seat for seat in self.seat_numbers.split(',') if seat]
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
 class Payment(models.Model):
     PAYMENT_STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -82,8 +139,13 @@ class Payment(models.Model):
         ('refunded', 'Refunded'),
     ]
     
-    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='payment')
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, null=True, blank=True,
+                                   related_name='payment')
+    itinerary = models.OneToOneField(Itinerary, on_delete=models.CASCADE, null=True, blank=True,
+                                     related_name='payment')
     amount = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
+    refund_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0,
+                                        validators=[MinValueValidator(0)])
     payment_method = models.CharField(max_length=50)
     transaction_id = models.CharField(max_length=100, unique=True)
     status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='pending')
@@ -91,4 +153,150 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Payment {self.transaction_id} - {self.booking.confirmation_code}"
\ No newline at end of file
+        if self.booking_id:
+            return f"Payment {self.transaction_id} - {self.booking.confirmation_code}"
+        return f"Payment {self.transaction_id} - itinerary {self.itinerary_id}"
+
+class PaymentJob(models.Model):
+    """A payment waiting for the process_payments worker"""
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name='job')
+    run_after = models.DateTimeField(db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claimed_by = models.CharField(max_length=100, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['run_after']
+
+    def __str__(self):
+        return f"Job for {self.payment.transaction_id}"
+
+class ArchivedBooking(models.Model):
+    """A completed or cancelled booking moved out of the hot Booking table by archive_bookings"""
+    STATUS_CHOICES = Booking.STATUS_CHOICES
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_bookings')
+    flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name='archived_bookings')
+    itinerary = models.ForeignKey(Itinerary, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='archived_bookings')
+    confirmation_code = models.CharField(max_length=10, unique=True)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    payment_method = models.CharField(max_length=50)
+    payment_reference = models.CharField(max_length=100, blank=True)
+    passenger_count = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at', 'id']),
+            models.Index(fields=['created_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"Archived booking {self.confirmation_code}"
+
+class ArchivedPassenger(models.Model):
+    booking = models.ForeignKey(ArchivedBooking, on_delete=models.CASCADE, related_name='passengers')
+    first_name = models.CharField(max_length=50)
+    last_name = models.CharField(max_length=50)
+    email = models.EmailField()
+    phone = models.CharField(max_length=20)
+    date_of_birth = models.DateField()
+    passport_number = models.CharField(max_length=20, blank=True)
+    seat_number = models.CharField(max_length=10, blank=True)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['created_at', 'id']
+
+    def __str__(self):
+        return f"{self.first_name} {self.last_name}"
+
+    @property
+    def full_name(self):
+        return f"{self.first_name} {self.last_name}"
+
+class ArchivedPayment(models.Model):
+    PAYMENT_STATUS_CHOICES = Payment.PAYMENT_STATUS_CHOICES
+
+    booking = models.OneToOneField(ArchivedBooking, on_delete=models.CASCADE, related_name='payment')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    refund_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    payment_method = models.CharField(max_length=50)
+    transaction_id = models.CharField(max_length=100, unique=True)
+    status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Archived payment {self.transaction_id}"
+
+class SalesRollup(models.Model):
+    """Running totals of confirmed and completed bookings, kept current by bookings.rollups"""
+    bookings = models.IntegerField(default=0)
+    seats = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        abstract = True
+
+class DailySales(SalesRollup):
+    date = models.DateField(unique=True, help_text="Day the bookings were made")
+
+    class Meta:
+        ordering = ['-date']
+        verbose_name_plural = 'daily sales'
+
+    def __str__(self):
+        return f"Sales on {self.date}"
+
+class FlightSales(SalesRollup):
+    flight = models.OneToOneField(Flight, on_delete=models.CASCADE, primary_key=True, related_name='sales')
+
+    class Meta:
+        verbose_name_plural = 'flight sales'
+
+    def __str__(self):
+        return f"Sales for {self.flight_id}"
+
+class AirlineSales(SalesRollup):
+    airline = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['-revenue']
+        verbose_name_plural = 'airline sales'
+
+    def __str__(self):
+        return f"Sales for {self.airline}"
+
+class RouteSales(SalesRollup):
+    origin = models.CharField(max_length=100)
+    destination = models.CharField(max_length=100)
+
+    class Meta:
+        ordering = ['-seats']
+        verbose_name_plural = 'route sales'
+        constraints = [
+            models.UniqueConstraint(fields=['origin', 'destination'], name='unique_route_sales'),
+        ]
+        indexes = [
+            models.Index(fields=['-seats']),
+        ]
+
+    def __str__(self):
+        return f"Sales for {self.origin} → {self.destination}"
+
+class BookingSearchDocument(models.Model):
+    """Text admin booking search runs against, mirrored into a full-text index (see flights.fulltext)"""
+    booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='search_document')
+    text = models.TextField()
+
+    def __str__(self):
+        return f"Search document for {self.booking_id}"
@@ -0,0 +1,210 @@
+import time
+import uuid
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from flights.models import Flight
+from .models import Booking, Passenger, Payment, PaymentJob
+from .rollups import change_status
+
+# Seconds a worker owns the jobs it claimed; after that another worker may retry them
+CLAIM_LEASE = timedelta(minutes=5)
+
+# Processor errors are retried this many times, backing off exponentially
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = timedelta(seconds=30)
+
+# Payment statuses a claimed job may still charge: queued, or left
+# processing by a worker whose claim lapsed
+CHARGEABLE_STATUSES = ('pending', 'processing')
+
+ChargeResult = namedtuple('ChargeResult', ['approved', 'reference', 'message'])
+
+
+class PaymentProcessorError(Exception):
+    """A temporary processor failure: the charge should be retried later"""
+
+
+class StubPaymentProcessor:
+    """
+    Local stand-in for a card processor.
+
+    Waits PAYMENT_STUB_LATENCY seconds per charge, declines cards ending in
+    0002 and fails temporarily for cards ending in 0119. Everything else is
+    approved. Charges are keyed on the payment's transaction_id, so a retry
+    after a crash never charges twice.
+    """
+
+    def charge(self, payment, card_last4):
+        time.sleep(settings.PAYMENT_STUB_LATENCY)
+        if card_last4 == '0119':
+            raise PaymentProcessorError('Processor timed out.')
+        if card_last4 == '0002':
+            return ChargeResult(False, '', 'Card declined.')
+        return ChargeResult(True, f'STUB-{uuid.uuid5(uuid.NAMESPACE_OID, payment.transaction_id).hex[:12]}', '')
+
+
+def get_processor():
+    return import_string(settings.PAYMENT_PROCESSOR)()
+
+
+def enqueue_payment(payment):
+    """Queue a pending payment for the worker"""
+    return PaymentJob.objects.create(payment=payment, run_after=timezone.now())
+
+
+def claim_jobs(worker_id, batch_size):
+    """
+    Claim up to batch_size due jobs for one worker and mark their payments
+    processing.
+
+    Jobs are claimed with a single conditional UPDATE, so two workers never
+    run the same job; a claim lapses after CLAIM_LEASE, so jobs of a worker
+    that died are picked up again. On databases that support it, rows
+    another worker is claiming are skipped rather than waited on.
+
+    In the same transaction, payments still pending (or left processing by
+    a worker that died) move to processing, which cancel_flights no longer
+    touches. Jobs whose payment was settled meanwhile, e.g. failed by
+    cancel_flights, are dropped. The payments are read after the move, so
+    the amount charged is the one stored at claim time.
+    """
+    now = timezone.now()
+    due = Q(run_after__lte=now) & (Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+    with transaction.atomic():
+        candidates = PaymentJob.objects.filter(due).order_by('run_after')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        PaymentJob.objects.filter(due, id__in=ids).update(claimed_by=worker_id, claimed_until=now + CLAIM_LEASE)
+        claimed = PaymentJob.objects.filter(id__in=ids, claimed_by=worker_id)
+        chargeable = Payment.objects.filter(job__in=claimed, status__in=CHARGEABLE_STATUSES)
+        if connection.features.has_select_for_update:
+            chargeable = chargeable.select_for_update(of=('self',))
+        payment_ids = list(chargeable.values_list('id', flat=True))
+        Payment.objects.filter(id__in=payment_ids).update(status='processing')
+        claimed.exclude(payment_id__in=payment_ids).delete()
+        return list(claimed.filter(payment_id__in=payment_ids).select_related('payment'))
+
+
+def process_payment_batch(worker_id, batch_size=50, processor=None):
+    """
+    Claim a batch of payment jobs, charge them and record the outcome.
+
+    Payments move pending -> processing while charged, then completed (the
+    bookings are confirmed) or failed (the bookings are cancelled and their
+    seats released). Temporary processor errors put the payment back to
+    pending and retry the job later. Returns the number of jobs handled.
+    """
+    processor = processor or get_processor()
+    jobs = claim_jobs(worker_id, batch_size)
+    if not jobs:
+        return 0
+
+    payments = [job.payment for job in jobs]
+    bookings = defaultdict(list)
+    for booking in Booking.objects.filter(
+            Q(id__in=[payment.booking_id for payment in payments if payment.booking_id]) |
+            Q(itinerary_id__in=[payment.itinerary_id for payment in payments if payment.itinerary_id])
+    ).only('id', 'flight_id', 'itinerary_id', 'passenger_count', 'payment_method', 'status'):
+        bookings[booking.itinerary_id or booking.id].append(booking)
+
+    approved, declined, retry = [], [], []
+    for job in jobs:
+        payment = job.payment
+        payment_bookings = bookings[payment.itinerary_id or payment.booking_id]
+        card_last4 = payment_bookings[0].payment_method[-4:] if payment_bookings else ''
+        try:
+            result = processor.charge(payment, card_last4)
+        except PaymentProcessorError as e:
+            job.last_error = str(e)
+            retry.append((job, ChargeResult(False, '', str(e)), payment_bookings))
+            continue
+        job.last_error = result.message
+        (approved if result.approved else declined).append((job, result, payment_bookings))
+
+    _finish_jobs(approved, declined, retry)
+    return len(jobs)
+
+
+def _finish_jobs(approved, declined, retry):
+    now = timezone.now()
+    for outcome in retry[:]:
+        outcome[0].attempts += 1
+        if outcome[0].attempts >= MAX_ATTEMPTS:
+            retry.remove(outcome)
+            declined.append(outcome)
+
+    with transaction.atomic():
+        if approved:
+            paid = []
+            for job, result, payment_bookings in approved:
+                job.payment.status, job.payment.processed_at = 'completed', now
+                for booking in payment_bookings:
+                    booking.payment_reference = result.reference
+                    paid.append(booking)
+            Payment.objects.bulk_update([job.payment for job, _, _ in approved], ['status', 'processed_at'])
+            Booking.objects.bulk_update(paid, ['payment_reference'])
+            change_status(Booking.objects.filter(id__in=[booking.id for booking in paid], status='pending'),
+                          'confirmed', now)
+            # Bookings cancelled while their payment was being charged, e.g. by
+            # cancel_flights, get their money back: the whole payment for a
+            # single booking, and for a trip whatever was charged beyond the
+            # legs still flying.
+            charged = Payment.objects.filter(id__in=[job.payment_id for job, _, _ in approved])
+            charged.filter(booking__status='cancelled').update(status='refunded', refund_amount=F('amount'))
+            flying = Booking.objects.filter(itinerary=OuterRef('itinerary')).exclude(status='cancelled').order_by(
+                ).values('itinerary').annotate(total=Sum('total_amount')).values('total')
+            flying = Coalesce(Subquery(flying), Value(Decimal(0)), output_field=DecimalField())
+            trips = charged.filter(itinerary__isnull=False, amount__gt=flying)
+            trips.update(refund_amount=F('amount') - flying)
+            trips.filter(refund_amount__gte=F('amount')).update(status='refunded')
+
+        if declined:
+            Payment.objects.filter(id__in=[job.payment_id for job, _, _ in declined]).update(
+                status='failed', processed_at=now)
+            failed = [booking for _, _, payment_bookings in declined for booking in payment_bookings
+                      if booking.status == 'pending']
+            Booking.objects.filter(id__in=[booking.id for booking in failed], status='pending').update(
+                status='cancelled', updated_at=now)
+            _release_booking_seats(failed)
+
+        if retry:
+            retry = [job for job, _, _ in retry]
+            for job in retry:
+                job.run_after = now + RETRY_BACKOFF * 2 ** (job.attempts - 1)
+                job.claimed_by, job.claimed_until = '', None
+            PaymentJob.objects.bulk_update(retry, ['attempts', 'run_after', 'claimed_by', 'claimed_until',
+                                                   'last_error'])
+            Payment.objects.filter(id__in=[job.payment_id for job in retry]).update(status='pending')
+
+        PaymentJob.objects.filter(id__in=[job.id for job, _, _ in approved + declined]).delete()
+
+
+def _release_booking_seats(bookings):
+    """Return the seats of cancelled bookings, one seat UPDATE per flight"""
+    if not bookings:
+        return
+    seats = defaultdict(list)
+    for booking_id, seat in Passenger.objects.filter(booking__in=bookings).exclude(seat_number='').values_list(
+            'booking_id', 'seat_number'):
+        seats[booking_id].append(seat)
+    by_flight = defaultdict(list)
+    for booking in bookings:
+        by_flight[booking.flight_id].append(booking)
+    flights = Flight.objects.only('aircraft', 'total_seats', 'departure_date').in_bulk(list(by_flight))
+    for flight_id, flight_bookings in by_flight.items():
+        flights[flight_id].release_seats(
+            sum(booking.passenger_count for booking in flight_bookings),
+            [seat for booking in flight_bookings for seat in seats[booking.id]],
+        )
@@ -0,0 +1,117 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AirlineSales, ArchivedBooking, Booking, DailySales, FlightSales, RouteSales
+
+# Booking statuses counted as sales
+SOLD_STATUSES = ('confirmed', 'completed')
+
+# Booking columns the rollups are keyed on, read under these names
+SALES_VALUES = {
+    'day': TruncDate('created_at'),
+    'flight_key': F('flight_id'),
+    'airline': F('flight__airline'),
+    'origin': F('flight__origin'),
+    'destination': F('flight__destination'),
+}
+
+# Each rollup table and its key fields, mapped to the SALES_VALUES they come from
+ROLLUPS = (
+    (DailySales, {'date': 'day'}),
+    (FlightSales, {'flight_id': 'flight_key'}),
+    (AirlineSales, {'airline': 'airline'}),
+    (RouteSales, {'origin': 'origin', 'destination': 'destination'}),
+)
+
+
+def change_status(bookings, status, now=None):
+    """
+    Move a queryset of bookings to status and update the rollups for the
+    bookings that start or stop counting as sales, in one transaction.
+
+    The bookings are read once and updated with a single UPDATE; each
+    rollup row touched gets one more. Returns the number of bookings
+    changed, so callers can tell whether they won a race for them.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            bookings = bookings.select_for_update(of=('self',))
+        rows = list(bookings.exclude(status=status).values(
+            'id', 'status', 'passenger_count', 'total_amount', **SALES_VALUES))
+        if not rows:
+            return 0
+        Booking.objects.filter(id__in=[row['id'] for row in rows]).update(status=status, updated_at=now)
+        sign = 1 if status in SOLD_STATUSES else -1
+        record_sales([row for row in rows if (row['status'] in SOLD_STATUSES) != (status in SOLD_STATUSES)], sign)
+    return len(rows)
+
+
+def record_sales(rows, sign=1):
+    """Add (or with sign=-1, remove) booking rows read with SALES_VALUES to every rollup"""
+    if not rows:
+        return
+    for model, keys in ROLLUPS:
+        totals = defaultdict(lambda: [0, 0, Decimal(0)])
+        for row in rows:
+            total = totals[tuple(row[value] for value in keys.values())]
+            total[0] += sign
+            total[1] += sign * row['passenger_count']
+            total[2] += sign * row['total_amount']
+        for key, (bookings, seats, revenue) in totals.items():
+            _bump(model, dict(zip(keys, key)), bookings, seats, revenue)
+
+
+def _bump(model, key, bookings, seats, revenue):
+    changes = {'bookings': F('bookings') + bookings, 'seats': F('seats') + seats, 'revenue': F('revenue') + revenue}
+    if model.objects.filter(**key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(bookings=bookings, seats=seats, revenue=revenue, **key)
+    except IntegrityError:
+        # Another transaction created the row first.
+        model.objects.filter(**key).update(**changes)
+
+
+def expected_sales(model, keys):
+    """A rollup's rows computed from scratch over current and archived bookings, by key"""
+    expected = defaultdict(lambda: [0, 0, Decimal(0)])
+    for source in (Booking, ArchivedBooking):
+        groups = source.objects.filter(status__in=SOLD_STATUSES).order_by().values(
+            **{value: SALES_VALUES[value] for value in keys.values()}
+        ).annotate(bookings=Count('id'), seats=Sum('passenger_count'), revenue=Sum('total_amount'))
+        for group in groups:
+            total = expected[tuple(group[value] for value in keys.values())]
+            total[0] += group['bookings']
+            total[1] += group['seats']
+            total[2] += group['revenue']
+    return expected
+
+
+def reconcile(model, keys, fix=True):
+    """
+    Compare a rollup table with totals rebuilt from the bookings and
+    return the keys that drifted as (key, stored, expected) tuples. With
+    fix, the table is replaced by the rebuilt rows in one transaction.
+    """
+    with transaction.atomic():
+        expected = expected_sales(model, keys)
+        stored = {tuple(row[field] for field in keys): [row['bookings'], row['seats'], row['revenue']]
+                  for row in model.objects.values(*keys, 'bookings', 'seats', 'revenue')}
+        empty = [0, 0, Decimal(0)]
+        drift = [(key, stored.get(key, empty), expected.get(key, empty))
+                 for key in sorted(set(stored) | set(expected), key=str)
+                 if stored.get(key, empty) != expected.get(key, empty)]
+        if fix and drift:
+            model.objects.all().delete()
+            model.objects.bulk_create(
+                model(bookings=bookings, seats=seats, revenue=revenue, **dict(zip(keys, key)))
+                for key, (bookings, seats, revenue) in expected.items()
+            )
+    return drift
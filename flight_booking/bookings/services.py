@@ -0,0 +1,285 @@
+import uuid
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from flights.autocomplete import city_index
+from flights.cache import invalidate_flight
+from flights.models import Airport, Flight
+from .codes import next_confirmation_code
+from .fulltext import index_bookings_on_commit
+from .holds import claim_hold, release_hold
+from .payments import enqueue_payment
+from .rollups import change_status
+from .models import Booking, IdempotencyKey, Itinerary, Passenger, Payment, PaymentJob, SeatHold
+
+# Passenger details copied onto every leg of an itinerary
+PASSENGER_FIELDS = ('first_name', 'last_name', 'email', 'phone', 'date_of_birth', 'passport_number')
+
+# Bookings marked completed per UPDATE by complete_departed_bookings
+COMPLETE_BATCH_SIZE = 1000
+
+# How far behind UTC the earliest timezone runs (UTC-12), for flights
+# whose origin airport is unknown
+UNKNOWN_ZONE_MARGIN = timedelta(hours=12)
+
+
+def take_seats(flight, hold, count, requested=()):
+    """
+    Seats for a new booking: the user's unexpired hold when it covers the
+    party, otherwise freshly reserved seats. Returns the requested seats
+    followed by the assigned ones, or None when they are not available.
+    """
+    if hold and hold.seats == count and claim_hold(hold):
+        held = hold.seat_list
+        moving = [seat for seat in requested if seat not in held]
+        spare = [seat for seat in held if seat not in requested]
+        if moving:
+            if not flight.move_seats(spare[-len(moving):], moving):
+                return None
+            spare = spare[:-len(moving)]
+        return list(requested) + spare
+    if hold and not hold.is_expired:
+        release_hold(hold)
+    return flight.reserve_seats(count, requested)
+
+
+def find_replay(user, key):
+    """The IdempotencyKey a user already completed a booking with, in one indexed query"""
+    if not key:
+        return None
+    return IdempotencyKey.objects.filter(key=key, user=user).first()
+
+
+def _replayed(user, key, error):
+    # A concurrent submission with the same key committed first.
+    replay = find_replay(user, key)
+    if replay is None:
+        raise error
+    return replay
+
+
+def create_booking(user, flight, passengers, card_number, hold=None, idempotency_key=None):
+    """
+    Book a flight for unsaved Passenger instances and queue the payment.
+
+    Runs in one transaction with a fixed number of statements whatever the
+    party size: the seat claim, one INSERT each for the booking, the
+    payment and its job, and a single bulk INSERT for all passengers.
+    Passengers without a preferred seat_number are given the seats assigned
+    next to the group. The booking stays pending until the process_payments
+    worker charges it. Returns the booking, or None, changing nothing, when the seats are gone.
+
+    With an idempotency_key, a resubmission that raced the original returns
+    the original booking instead of booking again.
+    """
+    requested = [passenger.seat_number for passenger in passengers if passenger.seat_number]
+    try:
+        return _create_booking(user, flight, passengers, card_number, hold, requested, idempotency_key)
+    except IntegrityError as e:
+        if not idempotency_key:
+            raise
+        return _replayed(user, idempotency_key, e).booking
+
+
+def _create_booking(user, flight, passengers, card_number, hold, requested, idempotency_key):
+    with transaction.atomic():
+        # Take the seats first: the user's hold, or a single
+        # conditional UPDATE that fails instead of overselling.
+        seats = take_seats(flight, hold, len(passengers), requested)
+        if not seats:
+            transaction.set_rollback(True)
+            return None
+        assigned = iter(seats[len(requested):])
+
+        total_amount = flight.price * len(passengers)
+        booking = Booking.objects.create(
+            user=user,
+            flight=flight,
+            total_amount=total_amount,
+            status='pending',
+            passenger_count=len(passengers),
+            payment_method=f"**** **** **** {card_number[-4:]}"
+        )
+        for passenger in passengers:
+            passenger.booking = booking
+            passenger.seat_number = passenger.seat_number or next(assigned)
+        Passenger.objects.bulk_create(passengers)
+        payment = Payment.objects.create(
+            booking=booking,
+            amount=total_amount,
+            payment_method='Credit Card',
+            transaction_id=str(uuid.uuid4()),
+            status='pending'
+        )
+        enqueue_payment(payment)
+        if idempotency_key:
+            IdempotencyKey.objects.create(key=idempotency_key, user=user, booking=booking)
+    return booking
+
+
+def create_itinerary(user, flights, passengers, card_number, idempotency_key=None):
+    """
+    Book the same passengers on several flights with one combined payment.
+
+    The bookings stay pending until the process_payments worker charges
+    the payment.
+
+    All or nothing: if any flight lacks the seats, every reservation is
+    rolled back and None is returned. Flight rows are locked in id order,
+    so two carts sharing flights wait for each other instead of
+    deadlocking. Bookings and the passengers of every leg are each written
+    with one bulk INSERT.
+    """
+    try:
+        return _create_itinerary(user, flights, passengers, card_number, idempotency_key)
+    except IntegrityError as e:
+        if not idempotency_key:
+            raise
+        return _replayed(user, idempotency_key, e).itinerary
+
+
+def _create_itinerary(user, flights, passengers, card_number, idempotency_key):
+    flights = sorted(flights, key=lambda flight: flight.id)
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            list(Flight.objects.select_for_update().filter(id__in=[flight.id for flight in flights])
+                 .order_by('id').values_list('id', flat=True))
+        seats = {}
+        for flight in flights:
+            seats[flight.id] = flight.reserve_seats(len(passengers))
+            if not seats[flight.id]:
+                transaction.set_rollback(True)
+                return None
+
+        total_amount = sum(flight.price for flight in flights) * len(passengers)
+        itinerary = Itinerary.objects.create(user=user, total_amount=total_amount)
+        bookings = [
+            Booking(
+                user=user,
+                flight=flight,
+                itinerary=itinerary,
+                confirmation_code=next_confirmation_code(),
+                total_amount=flight.price * len(passengers),
+                status='pending',
+                passenger_count=len(passengers),
+                payment_method=f"**** **** **** {card_number[-4:]}"
+            )
+            for flight in flights
+        ]
+        Booking.objects.bulk_create(bookings)
+
+        Passenger.objects.bulk_create(
+            Passenger(booking=booking, seat_number=seat,
+                      **{field: getattr(passenger, field) for field in PASSENGER_FIELDS})
+            for booking in bookings
+            for passenger, seat in zip(passengers, seats[booking.flight_id])
+        )
+        index_bookings_on_commit(booking.id for booking in bookings)
+
+        payment = Payment.objects.create(
+            itinerary=itinerary,
+            amount=total_amount,
+            payment_method='Credit Card',
+            transaction_id=str(uuid.uuid4()),
+            status='pending'
+        )
+        enqueue_payment(payment)
+        if idempotency_key:
+            IdempotencyKey.objects.create(key=idempotency_key, user=user, itinerary=itinerary)
+    return itinerary
+
+
+def cancel_flights(flight_ids):
+    """
+    Deactivate flights and cancel every open booking on them.
+
+    Everything is set-based and runs in one transaction, so the number of
+    statements does not depend on how many bookings a flight has:
+    - charged single-flight payments are refunded in full, and charged trip
+      payments are refunded the price of the cancelled legs;
+    - queued single-flight payments are dropped, and queued trip payments
+      are reduced to the legs still flying; payments being charged right
+      now are refunded by the worker once the charge goes through;
+    - seat holds are removed and the flights' seats reset to empty.
+    Returns the number of bookings cancelled.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Lock and deactivate the flights before reading their bookings, so
+        # a booking racing the cancellation either commits first and is
+        # cancelled here, or finds the flight inactive and takes no seats.
+        flights = Flight.objects.filter(id__in=flight_ids).only(
+            'origin', 'destination', 'departure_date', 'is_active').order_by('id')
+        if connection.features.has_select_for_update:
+            flights = flights.select_for_update()
+        flights = list(flights)
+        Flight.objects.filter(id__in=[flight.id for flight in flights]).update(
+            is_active=False, available_seats=F('total_seats'), seat_map=b'', updated_at=now)
+        booking_ids = list(Booking.objects.filter(
+            flight__in=flights, status__in=['pending', 'confirmed']).values_list('id', flat=True))
+        if booking_ids:
+            legs = Booking.objects.filter(id__in=booking_ids, itinerary=OuterRef('itinerary')).order_by().values(
+                'itinerary').annotate(total=Sum('total_amount')).values('total')
+            trips = Payment.objects.filter(itinerary__bookings__id__in=booking_ids)
+
+            Payment.objects.filter(booking_id__in=booking_ids, status='completed').update(
+                status='refunded', refund_amount=F('amount'))
+            trips.filter(status='completed').update(refund_amount=F('refund_amount') + Subquery(legs))
+            trips.filter(status='completed', refund_amount__gte=F('amount')).update(status='refunded')
+
+            trips.filter(status='pending').update(amount=F('amount') - Subquery(legs))
+            unpaid = Q(booking_id__in=booking_ids) | Q(itinerary__bookings__id__in=booking_ids, amount__lte=0)
+            PaymentJob.objects.filter(payment__in=Payment.objects.filter(unpaid, status='pending')).delete()
+            Payment.objects.filter(unpaid, status='pending').update(status='failed', processed_at=now)
+
+            change_status(Booking.objects.filter(id__in=booking_ids), 'cancelled', now)
+        SeatHold.objects.filter(flight__in=flights).delete()
+
+    # Queryset updates skip post_save, so clear caches here.
+    for flight in flights:
+        invalidate_flight(flight)
+        if flight.is_active and city_index.is_built:
+            city_index.remove_flight(flight.origin, flight.destination)
+    return len(booking_ids)
+
+
+def _departed(now):
+    """
+    Q matching bookings whose flight has departed by now.
+
+    Schedule times are local to the origin airport, so each airport
+    timezone in use is compared with its own local time. Flights from an
+    unknown airport, or one whose timezone is blank or not a known zone,
+    count as departed once the departure has passed everywhere on earth,
+    UNKNOWN_ZONE_MARGIN behind UTC.
+    """
+    def departed_by(local):
+        return Q(flight__departure_date__lt=local.date()) | Q(
+            flight__departure_date=local.date(), flight__departure_time__lte=local.time())
+
+    unknown = Q(flight__origin_airport__isnull=True)
+    departed = Q()
+    for name in Airport.objects.order_by().values_list('timezone', flat=True).distinct():
+        zone = Airport.parse_zone(name)
+        if zone is None:
+            unknown |= Q(flight__origin_airport__timezone=name)
+        else:
+            departed |= Q(flight__origin_airport__timezone=name) & departed_by(now.astimezone(zone))
+    return departed | (unknown & departed_by(now.astimezone(dt_timezone.utc) - UNKNOWN_ZONE_MARGIN))
+
+
+def complete_departed_bookings(batch_size=COMPLETE_BATCH_SIZE, now=None):
+    """
+    Mark up to batch_size confirmed bookings whose flight has departed as
+    completed, and return how many were.
+
+    A single UPDATE selects its batch with a LIMITed subquery joined to the
+    flight's departure date and time in its origin airport's timezone, so
+    each call holds its locks only for one bounded statement.
+    """
+    now = now or timezone.now()
+    batch = Booking.objects.filter(_departed(now), status='confirmed').order_by().values('id')[:batch_size]
+    return Booking.objects.filter(id__in=batch, status='confirmed').update(status='completed', updated_at=now)
@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .fulltext import index_bookings_on_commit
+from .models import Booking, Passenger
+
+# User fields copied into booking search documents
+USER_SEARCH_FIELDS = {'email', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Passenger)
+def passenger_saved(sender, instance, created, raw=False, **kwargs):
+    """Count a passenger added one at a time (bulk inserts set the count themselves) and reindex its booking"""
+    if created and not raw:
+        Booking.objects.filter(id=instance.booking_id).update(passenger_count=F('passenger_count') + 1)
+    index_bookings_on_commit([instance.booking_id])
+
+
+@receiver(post_delete, sender=Passenger)
+def passenger_deleted(sender, instance, origin=None, **kwargs):
+    """Uncount a removed passenger, unless its booking is being deleted along with it"""
+    if isinstance(origin, Booking) or getattr(origin, 'model', None) is Booking:
+        return
+    Booking.objects.filter(id=instance.booking_id, passenger_count__gt=0).update(
+        passenger_count=F('passenger_count') - 1)
+    index_bookings_on_commit([instance.booking_id])
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, **kwargs):
+    index_bookings_on_commit([instance.id])
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Reindex a customer's bookings when their name or email changes, but not on every login"""
+    if created or (update_fields is not None and not USER_SEARCH_FIELDS & set(update_fields)):
+        return
+    index_bookings_on_commit(instance.bookings.values_list('id', flat=True))
@@ -0,0 +1,247 @@
+import threading
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from accounts.models import User
+from flights.models import Flight
+from .codes import next_confirmation_code
+from .models import Booking, Passenger, Payment, PaymentJob, SeatHold
+from .payments import ChargeResult, process_payment_batch
+from .services import cancel_flights, create_booking, create_itinerary
+
+# Statements create_booking runs whatever the party size: the savepoint
+# and its release, the seat map read and conditional UPDATE, and one
+# INSERT each for the booking, its passengers, the payment and its job.
+CREATE_BOOKING_QUERIES = 8
+
+
+class CreateBookingQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='traveller', email='traveller@example.com', password='pw')
+        departure = date.today() + timedelta(days=30)
+        cls.flight = Flight.objects.create(
+            airline='SkyWings', flight_number='SW100', origin='New York (JFK)', destination='London (LHR)',
+            departure_date=departure, departure_time=time(8), arrival_date=departure, arrival_time=time(20),
+            duration='7h', price=Decimal('299.00'), total_seats=180, available_seats=180,
+            aircraft='Boeing 737-800',
+        )
+
+    def setUp(self):
+        # Reserve a block of confirmation codes first, as a running server
+        # already has, so only the booking's own statements are counted.
+        with self.captureOnCommitCallbacks(execute=True):
+            next_confirmation_code()
+
+    def passengers(self, count):
+        return [
+            Passenger(first_name='Ada', last_name=f'Traveller{n}', email='ada@example.com', phone='555-0100',
+                      date_of_birth=date(1990, 1, 1), passport_number=f'P{n:07d}')
+            for n in range(count)
+        ]
+
+    def test_single_passenger(self):
+        with self.assertNumQueries(CREATE_BOOKING_QUERIES):
+            booking = create_booking(self.user, self.flight, self.passengers(1), '4111111111111111')
+        self.assertEqual(booking.passengers.count(), 1)
+
+    def test_full_party_costs_the_same(self):
+        with self.assertNumQueries(CREATE_BOOKING_QUERIES):
+            booking = create_booking(self.user, self.flight, self.passengers(9), '4111111111111111')
+        self.assertEqual(booking.passengers.count(), 9)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.available_seats, 171)
+
+
+class SeatReservationConcurrencyTests(TransactionTestCase):
+    """Many threads booking a small flight at once, as in a flash sale"""
+
+    seats = 20
+    party_size = 2
+    threads = 8
+    attempts = 10
+
+    def test_concurrent_reservations_never_oversell(self):
+        departure = date.today() + timedelta(days=30)
+        flight = Flight.objects.create(
+            airline='SkyWings', flight_number='SW200', origin='New York (JFK)', destination='London (LHR)',
+            departure_date=departure, departure_time=time(8), arrival_date=departure, arrival_time=time(20),
+            duration='7h', price=Decimal('99.00'), total_seats=self.seats, available_seats=self.seats,
+            aircraft='Boeing 737-800',
+        )
+        claimed = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                for _ in range(self.attempts):
+                    try:
+                        reserved = flight.reserve_seats(self.party_size)
+                    except OperationalError:
+                        # SQLite reports lock timeouts instead of waiting forever.
+                        reserved = None
+                    if reserved:
+                        with lock:
+                            claimed.extend(reserved)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        flight.refresh_from_db()
+        sold = self.seats - flight.available_seats
+        taken = sum(bin(byte).count('1') for byte in bytes(flight.seat_map))
+        self.assertGreater(sold, 0)
+        self.assertLessEqual(len(claimed), self.seats)
+        self.assertEqual(sold, len(claimed))
+        self.assertEqual(len(set(claimed)), len(claimed))
+        self.assertEqual(taken, sold)
+
+
+class RecordingProcessor:
+    """Approves every charge and records the amounts, running on_charge first"""
+
+    def __init__(self, on_charge=None):
+        self.on_charge = on_charge
+        self.charged = []
+
+    def charge(self, payment, card_last4):
+        if self.on_charge:
+            self.on_charge()
+        self.charged.append(payment.amount)
+        return ChargeResult(True, 'TEST-REF', '')
+
+
+class CancelFlightsTests(TestCase):
+    """Money and seats when flights are cancelled before, during and after the charge"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='traveller', email='traveller@example.com', password='pw')
+        departure = date.today() + timedelta(days=30)
+        cls.outbound, cls.onward = (
+            Flight.objects.create(
+                airline='SkyWings', flight_number=number, origin=origin, destination=destination,
+                departure_date=departure, departure_time=time(8), arrival_date=departure, arrival_time=time(20),
+                duration='7h', price=price, total_seats=180, available_seats=180, aircraft='Boeing 737-800',
+            )
+            for number, origin, destination, price in (
+                ('SW300', 'New York (JFK)', 'London (LHR)', Decimal('300.00')),
+                ('SW301', 'London (LHR)', 'Paris (CDG)', Decimal('100.00')),
+            )
+        )
+
+    def passengers(self, count=2):
+        return [
+            Passenger(first_name='Ada', last_name=f'Traveller{n}', email='ada@example.com', phone='555-0100',
+                      date_of_birth=date(1990, 1, 1), passport_number=f'P{n:07d}')
+            for n in range(count)
+        ]
+
+    def book(self):
+        return create_booking(self.user, self.outbound, self.passengers(), '4111111111111111')
+
+    def book_trip(self):
+        return create_itinerary(self.user, [self.outbound, self.onward], self.passengers(), '4111111111111111')
+
+    def charge(self, on_charge=None):
+        processor = RecordingProcessor(on_charge)
+        process_payment_batch('test-worker', processor=processor)
+        return processor.charged
+
+    def test_cancel_refunds_charged_booking(self):
+        booking = self.book()
+        self.charge()
+
+        self.assertEqual(cancel_flights([self.outbound.id]), 1)
+        payment = Payment.objects.get(booking=booking)
+        self.assertEqual(payment.status, 'refunded')
+        self.assertEqual(payment.refund_amount, Decimal('600.00'))
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'cancelled')
+
+    def test_cancel_resets_seats_and_holds(self):
+        self.book()
+        SeatHold.objects.create(flight=self.outbound, user=self.user, seats=1, seat_numbers='1A',
+                                expires_at=timezone.now() + timedelta(minutes=10))
+
+        cancel_flights([self.outbound.id])
+        self.outbound.refresh_from_db()
+        self.assertFalse(self.outbound.is_active)
+        self.assertEqual(self.outbound.available_seats, self.outbound.total_seats)
+        self.assertEqual(bytes(self.outbound.seat_map), b'')
+        self.assertFalse(SeatHold.objects.filter(flight=self.outbound).exists())
+
+    def test_cancel_drops_queued_payment(self):
+        booking = self.book()
+
+        cancel_flights([self.outbound.id])
+        payment = Payment.objects.get(booking=booking)
+        self.assertEqual(payment.status, 'failed')
+        self.assertFalse(PaymentJob.objects.filter(payment=payment).exists())
+        self.assertEqual(self.charge(), [])
+
+    def test_cancel_one_leg_refunds_part_of_charged_trip(self):
+        itinerary = self.book_trip()
+        self.charge()
+
+        self.assertEqual(cancel_flights([self.outbound.id]), 1)
+        payment = Payment.objects.get(itinerary=itinerary)
+        self.assertEqual(payment.status, 'completed')
+        self.assertEqual(payment.refund_amount, Decimal('600.00'))
+        self.assertEqual(itinerary.bookings.get(flight=self.onward).status, 'confirmed')
+
+    def test_cancel_every_leg_refunds_whole_trip(self):
+        itinerary = self.book_trip()
+        self.charge()
+
+        cancel_flights([self.outbound.id, self.onward.id])
+        payment = Payment.objects.get(itinerary=itinerary)
+        self.assertEqual(payment.status, 'refunded')
+        self.assertEqual(payment.refund_amount, payment.amount)
+
+    def test_cancel_one_leg_reduces_queued_trip_payment(self):
+        itinerary = self.book_trip()
+
+        cancel_flights([self.outbound.id])
+        payment = Payment.objects.get(itinerary=itinerary)
+        self.assertEqual(payment.status, 'pending')
+        self.assertEqual(payment.amount, Decimal('200.00'))
+        self.assertEqual(self.charge(), [Decimal('200.00')])
+        self.assertEqual(itinerary.bookings.get(flight=self.onward).status, 'confirmed')
+
+    def test_cancel_during_charge_refunds_booking(self):
+        booking = self.book()
+
+        self.assertEqual(self.charge(lambda: cancel_flights([self.outbound.id])), [Decimal('600.00')])
+        payment = Payment.objects.get(booking=booking)
+        self.assertEqual(payment.status, 'refunded')
+        self.assertEqual(payment.refund_amount, Decimal('600.00'))
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'cancelled')
+
+    def test_cancel_during_charge_refunds_cancelled_trip_leg(self):
+        itinerary = self.book_trip()
+
+        self.assertEqual(self.charge(lambda: cancel_flights([self.outbound.id])), [Decimal('800.00')])
+        payment = Payment.objects.get(itinerary=itinerary)
+        self.assertEqual(payment.status, 'completed')
+        self.assertEqual(payment.refund_amount, Decimal('600.00'))
+        self.assertEqual(itinerary.bookings.get(flight=self.onward).status, 'confirmed')
+
+    def test_booking_after_cancel_takes_no_seats(self):
+        cancel_flights([self.outbound.id])
+
+        # The view loaded the flight before it was cancelled.
+        self.assertIsNone(self.book())
+        self.assertFalse(Booking.objects.filter(flight=self.outbound).exists())
+        self.outbound.refresh_from_db()
+        self.assertEqual(self.outbound.available_seats, self.outbound.total_seats)
@@ -9,6 +9,10 @@ urlpatterns = [
     path('my-bookings/', views.my_bookings, name='my_bookings'),
     path('booking/<uuid:booking_id>/', views.booking_detail, name='booking_detail'),
     path('booking/<uuid:booking_id>/cancel/', views.cancel_booking, name='cancel_booking'),
+    path('cart/', views.cart, name='cart'),
+    path('cart/add/<int:flight_id>/', views.cart_add, name='cart_add'),
+    path('cart/remove/<int:flight_id>/', views.cart_remove, name='cart_remove'),
+    path('itinerary/<uuid:itinerary_id>/', views.itinerary_detail, name='itinerary_detail'),
     
     # Admin URLs
     path('admin/bookings/', views.admin_bookings, name='admin_bookings'),
@@ -2,76 +2,73 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.db import transaction
+from django.db.models import Q
 from django.http import Http404
-from django.core.paginator import Paginator
+from django.utils import timezone
 from flights.models import Flight
-from .models import Booking, Passenger, Payment
-from .forms import PassengerFormSet, PaymentForm
-import uuid
-from datetime import datetime
+from flights.pagination import KeysetPaginator
+from flights.seatmap import SeatMap
+from .holds import place_hold
+from .models import ArchivedBooking, Booking, Itinerary, Payment, SeatHold
+from .forms import MAX_PASSENGERS, MIN_PASSENGERS, PassengerFormSet, PaymentForm
+from .fulltext import match_bookings
+from .rollups import change_status
+from .services import create_booking, create_itinerary, find_replay
+
+# Most flights a single multi-city checkout can hold
+CART_MAX_FLIGHTS = 6
 
 @login_required
 def book_flight(request, flight_id):
     """Flight booking process"""
     flight = get_object_or_404(Flight, id=flight_id, is_active=True)
-    passengers_count = int(request.GET.get('passengers', 1))
-    
-    if passengers_count > flight.available_seats:
-        messages.error(request, 'Not enough seats available for this flight.')
+    passengers_count = _passengers_count(request)
+    if passengers_count is None:
+        messages.error(request, f'You can book for {MIN_PASSENGERS} to {MAX_PASSENGERS} passengers.')
         return redirect('flights:flight_detail', flight_id=flight.id)
     
     if request.method == 'POST':
+        replay = find_replay(request.user, request.POST.get('idempotency_key'))
+        if replay and replay.booking_id:
+            messages.info(request, 'This booking was already completed.')
+            return redirect('bookings:booking_confirmation', booking_id=replay.booking_id)
+        hold = SeatHold.objects.filter(flight=flight, user=request.user, expires_at__gt=timezone.now()).first()
         passenger_formset = PassengerFormSet(request.POST)
         payment_form = PaymentForm(request.POST)
         
-        if passenger_formset.is_valid() and payment_form.is_valid():
+        if (passenger_formset.is_valid() and payment_form.is_valid() and _seats_valid(flight, passenger_formset)
+                and _party_matches(passenger_formset, hold.seats if hold else passengers_count)):
+            passengers = [form.save(commit=False) for form in passenger_formset if form.cleaned_data]
             try:
-                with transaction.atomic():
-                    # Create booking
-                    total_amount = flight.price * len(passenger_formset.forms)
-                    booking = Booking.objects.create(
-                        user=request.user,
-                        flight=flight,
-                        total_amount=total_amount,
-                        status='confirmed',
-                        payment_method=f"**** **** **** {payment_form.cleaned_data['card_number'][-4:]}"
-                    )
-                    
-                    # Create passengers
-                    for form in passenger_formset:
-                        if form.cleaned_data:
-                            passenger = form.save(commit=False)
-                            passenger.booking = booking
-                            passenger.save()
-                    
-                    # Create payment record
-                    Payment.objects.create(
-                        booking=booking,
-                        amount=total_amount,
-                        payment_method='Credit Card',
-                        transaction_id=str(uuid.uuid4()),
-                        status='completed',
-                        processed_at=datetime.now()
-                    )
-                    
-                    # Update flight availability
-                    flight.available_seats -= len(passenger_formset.forms)
-                    flight.save()
-                    
-                    messages.success(request, f'Booking confirmed! Your confirmation code is {booking.confirmation_code}')
-                    return redirect('bookings:booking_confirmation', booking_id=booking.id)
+                booking = create_booking(request.user, flight, passengers,
+                                         payment_form.cleaned_data['card_number'], hold=hold,
+                                         idempotency_key=payment_form.cleaned_data['idempotency_key'])
+                if booking is None:
+                    messages.error(request, 'Sorry, those seats were just booked by someone else.')
+                    return redirect('flights:flight_detail', flight_id=flight.id)
+                messages.success(request, f'Booking received! Your confirmation code is {booking.confirmation_code}. '
+                                          'We will confirm it as soon as your payment is processed.')
+                return redirect('bookings:booking_confirmation', booking_id=booking.id)
                     
             except Exception as e:
                 messages.error(request, 'An error occurred while processing your booking. Please try again.')
     else:
+        # Hold the seats while the user fills in the form
+        hold = place_hold(flight, request.user, passengers_count)
+        if hold is None:
+            messages.error(request, 'Not enough seats available for this flight.')
+            return redirect('flights:flight_detail', flight_id=flight.id)
+        flight.refresh_from_db(fields=['available_seats', 'seat_map'])
+        
         # Initialize formset with the number of passengers
         passenger_formset = PassengerFormSet()
         # Adjust formset to match passenger count
-        passenger_formset.extra = passengers_count
+        passenger_formset.extra = passengers_count - passenger_formset.min_num
         payment_form = PaymentForm()
     
     context = {
         'flight': flight,
+        'hold': hold,
         'passenger_formset': passenger_formset,
         'payment_form': payment_form,
         'passengers_count': passengers_count,
@@ -79,28 +76,151 @@ def book_flight(request, flight_id):
     }
     return render(request, 'bookings/book_flight.html', context)
 
+def _passengers_count(request):
+    """The requested party size, or None when it is not a number from 1 to 9"""
+    try:
+        count = int(request.GET.get('passengers', MIN_PASSENGERS))
+    except ValueError:
+        return None
+    return count if MIN_PASSENGERS <= count <= MAX_PASSENGERS else None
+
+def _party_matches(passenger_formset, count):
+    """Check the formset has exactly the passengers the seats were held for"""
+    filled = sum(1 for form in passenger_formset if form.cleaned_data)
+    if filled != count:
+        passenger_formset.non_form_errors().append(f'Please enter details for exactly {count} passengers.')
+        return False
+    return True
+
+def _seats_valid(flight, passenger_formset):
+    """Check requested seats exist on the flight and are not requested twice"""
+    seat_map = SeatMap.for_flight(flight)
+    requested = set()
+    for form in passenger_formset:
+        seat = form.cleaned_data.get('seat_number') if form.cleaned_data else None
+        if not seat:
+            continue
+        try:
+            seat_map.index(seat)
+        except ValueError as e:
+            form.add_error('seat_number', str(e))
+            continue
+        if seat in requested:
+            form.add_error('seat_number', f'Seat {seat} is already chosen for another passenger.')
+        requested.add(seat)
+    return passenger_formset.is_valid()
+
+def _cart_flight_ids(request):
+    return request.session.get('cart', [])
+
+@login_required
+def cart_add(request, flight_id):
+    """Add a flight to the multi-city cart"""
+    flight = get_object_or_404(Flight, id=flight_id, is_active=True)
+    cart = _cart_flight_ids(request)
+    if request.method == 'POST' and flight.id not in cart:
+        if len(cart) >= CART_MAX_FLIGHTS:
+            messages.error(request, f'A trip can include at most {CART_MAX_FLIGHTS} flights.')
+        else:
+            request.session['cart'] = cart + [flight.id]
+            messages.success(request, f'{flight.flight_number} added to your trip.')
+    return redirect('bookings:cart')
+
+@login_required
+def cart_remove(request, flight_id):
+    """Remove a flight from the multi-city cart"""
+    if request.method == 'POST':
+        request.session['cart'] = [cart_id for cart_id in _cart_flight_ids(request) if cart_id != flight_id]
+    return redirect('bookings:cart')
+
+@login_required
+def cart(request):
+    """Check out every flight in the cart together, with one payment"""
+    flights = Flight.objects.filter(id__in=_cart_flight_ids(request), is_active=True).order_by(
+        'departure_date', 'departure_time')
+    flights = list(flights)
+    passengers_count = _passengers_count(request)
+    if passengers_count is None:
+        messages.error(request, f'You can book for {MIN_PASSENGERS} to {MAX_PASSENGERS} passengers.')
+        return redirect('bookings:cart')
+    
+    if request.method == 'POST':
+        replay = find_replay(request.user, request.POST.get('idempotency_key'))
+        if replay and replay.itinerary_id:
+            messages.info(request, 'This trip was already booked.')
+            return redirect('bookings:itinerary_detail', itinerary_id=replay.itinerary_id)
+    
+    if request.method == 'POST' and flights:
+        passenger_formset = PassengerFormSet(request.POST)
+        payment_form = PaymentForm(request.POST)
+        
+        if (passenger_formset.is_valid() and payment_form.is_valid()
+                and _party_matches(passenger_formset, passengers_count)):
+            passengers = [form.save(commit=False) for form in passenger_formset if form.cleaned_data]
+            itinerary = create_itinerary(request.user, flights, passengers, payment_form.cleaned_data['card_number'],
+                                         idempotency_key=payment_form.cleaned_data['idempotency_key'])
+            if itinerary is None:
+                messages.error(request, 'Sorry, one of these flights no longer has enough seats. Nothing was booked.')
+            else:
+                request.session['cart'] = []
+                messages.success(request, 'Trip received! Each flight has its own confirmation code below. '
+                                          'We will confirm them as soon as your payment is processed.')
+                return redirect('bookings:itinerary_detail', itinerary_id=itinerary.id)
+    else:
+        passenger_formset = PassengerFormSet()
+        passenger_formset.extra = passengers_count - passenger_formset.min_num
+        payment_form = PaymentForm()
+    
+    context = {
+        'flights': flights,
+        'passenger_formset': passenger_formset,
+        'payment_form': payment_form,
+        'passengers_count': passengers_count,
+        'total_amount': sum(flight.price for flight in flights) * passengers_count,
+    }
+    return render(request, 'bookings/cart.html', context)
+
+@login_required
+def itinerary_detail(request, itinerary_id):
+    """All bookings of a multi-city trip"""
+    itinerary = get_object_or_404(Itinerary, id=itinerary_id, user=request.user)
+    bookings = itinerary.bookings.select_related('flight').prefetch_related('passengers').order_by(
+        'flight__departure_date', 'flight__departure_time')
+    return render(request, 'bookings/itinerary_detail.html', {'itinerary': itinerary, 'bookings': bookings})
+
 @login_required
 def booking_confirmation(request, booking_id):
     """Booking confirmation page"""
     booking = get_object_or_404(Booking, id=booking_id, user=request.user)
-    return render(request, 'bookings/booking_confirmation.html', {'booking': booking})
+    # A booking on a trip is paid for by the trip's payment
+    payment_failed = booking.status == 'cancelled' and Payment.objects.filter(
+        Q(booking=booking) | Q(itinerary__bookings=booking), status='failed').exists()
+    return render(request, 'bookings/booking_confirmation.html',
+                  {'booking': booking, 'payment_failed': payment_failed})
+
+def _get_booking(**filters):
+    """A booking by id, looked up in the archive only when it is not a current one"""
+    booking = Booking.objects.filter(**filters).first()
+    return booking or get_object_or_404(ArchivedBooking, **filters)
 
 @login_required
 def my_bookings(request):
     """User's booking history"""
-    bookings = Booking.objects.filter(user=request.user).select_related('flight').order_by('-created_at')
+    # Archived bookings are only read when the user asks for past trips
+    history = request.GET.get('history') == '1'
+    model = ArchivedBooking if history else Booking
+    bookings = model.objects.filter(user=request.user).select_related('flight')
     
     # Pagination
-    paginator = Paginator(bookings, 10)
-    page_number = request.GET.get('page')
-    bookings = paginator.get_page(page_number)
+    paginator = KeysetPaginator(bookings, 10)
+    bookings = paginator.get_page(request.GET.get('after'), request.GET.get('before'))
     
-    return render(request, 'bookings/my_bookings.html', {'bookings': bookings})
+    return render(request, 'bookings/my_bookings.html', {'bookings': bookings, 'history': history})
 
 @login_required
 def booking_detail(request, booking_id):
     """Detailed view of a specific booking"""
-    booking = get_object_or_404(Booking, id=booking_id, user=request.user)
+    booking = _get_booking(id=booking_id, user=request.user)
     return render(request, 'bookings/booking_detail.html', {'booking': booking})
 
 @login_required
@@ -114,12 +234,12 @@ def cancel_booking(request, booking_id):
     
     if request.method == 'POST':
         with transaction.atomic():
-            booking.status = 'cancelled'
-            booking.save()
-            
-            # Return seats to flight
-            booking.flight.available_seats += booking.passenger_count
-            booking.flight.save()
+            # Only the request that flips the status returns the seats, so a
+            # double submit cannot release them twice.
+            cancelled = change_status(Booking.objects.filter(id=booking.id, status='confirmed'), 'cancelled')
+            if cancelled:
+                seats = [seat for seat in booking.passengers.values_list('seat_number', flat=True) if seat]
+                booking.flight.release_seats(booking.passenger_count, seats)
             
             messages.success(request, 'Booking cancelled successfully.')
             return redirect('bookings:my_bookings')
@@ -132,39 +252,43 @@ def is_admin(user):
 @user_passes_test(is_admin)
 def admin_bookings(request):
     """Admin view of all bookings"""
-    bookings = Booking.objects.select_related('user', 'flight').order_by('-created_at')
+    history = request.GET.get('history') == '1'
+    model = ArchivedBooking if history else Booking
+    bookings = model.objects.select_related('user', 'flight')
     
     # Filter by status
     status_filter = request.GET.get('status')
     if status_filter:
         bookings = bookings.filter(status=status_filter)
     
-    # Search functionality
+    # Search functionality: current bookings through the full-text index, the archive by scanning
     search_query = request.GET.get('search', '')
-    if search_query:
+    if search_query and not history:
+        bookings = match_bookings(bookings, search_query)
+    elif search_query:
         bookings = bookings.filter(
-            models.Q(confirmation_code__icontains=search_query) |
-            models.Q(user__email__icontains=search_query) |
-            models.Q(user__first_name__icontains=search_query) |
-            models.Q(user__last_name__icontains=search_query) |
-            models.Q(flight__flight_number__icontains=search_query)
+            Q(confirmation_code__icontains=search_query) |
+            Q(user__email__icontains=search_query) |
+            Q(user__first_name__icontains=search_query) |
+            Q(user__last_name__icontains=search_query) |
+            Q(flight__flight_number__icontains=search_query)
         )
     
     # Pagination
-    paginator = Paginator(bookings, 20)
-    page_number = request.GET.get('page')
-    bookings = paginator.get_page(page_number)
+    paginator = KeysetPaginator(bookings, 20, count=True)
+    bookings = paginator.get_page(request.GET.get('after'), request.GET.get('before'))
     
     context = {
         'bookings': bookings,
         'status_filter': status_filter,
         'search_query': search_query,
         'status_choices': Booking.STATUS_CHOICES,
+        'history': history,
     }
     return render(request, 'bookings/admin_bookings.html', context)
 
 @user_passes_test(is_admin)
 def admin_booking_detail(request, booking_id):
     """Admin detailed view of a booking"""
-    booking = get_object_or_404(Booking, id=booking_id)
+    booking = _get_booking(id=booking_id)
     return render(request, 'bookings/admin_booking_detail.html', {'booking': booking})
\ No newline at end of file
@@ -68,6 +68,49 @@ DATABASES = {
     }
 }
 
+# Cache
+# LocMemCache is per-process and evicts least-recently-used entries once
+# MAX_ENTRIES is reached; point this at a shared backend in production so
+# cache invalidation reaches every worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'skybook',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
+# Seconds a flight search result stays cached
+FLIGHT_SEARCH_CACHE_TIMEOUT = config('FLIGHT_SEARCH_CACHE_TIMEOUT', default=120, cast=int)
+
+# Seconds the popular origins/destinations ranking stays cached between refreshes
+POPULAR_PLACES_CACHE_TIMEOUT = config('POPULAR_PLACES_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Seconds the approximate totals shown by keyset-paginated admin lists are cached
+PAGINATION_COUNT_CACHE_TIMEOUT = config('PAGINATION_COUNT_CACHE_TIMEOUT', default=300, cast=int)
+
+# Seconds a single connecting-itinerary search may spend routing
+CONNECTION_SEARCH_TIME_BUDGET = config('CONNECTION_SEARCH_TIME_BUDGET', default=0.05, cast=float)
+
+# Seconds before the in-process autocomplete index is rebuilt from the database
+CITY_INDEX_MAX_AGE = config('CITY_INDEX_MAX_AGE', default=300, cast=int)
+
+# Seconds seats stay held for a user after the booking form opens
+SEAT_HOLD_TTL = config('SEAT_HOLD_TTL', default=600, cast=int)
+
+# Seconds a booking idempotency key is kept before purge_idempotency_keys removes it
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=86400, cast=int)
+
+# Card processor used by the process_payments worker, and the stub's simulated latency in seconds
+PAYMENT_PROCESSOR = config('PAYMENT_PROCESSOR', default='bookings.payments.StubPaymentProcessor')
+PAYMENT_STUB_LATENCY = config('PAYMENT_STUB_LATENCY', default=0.2, cast=float)
+
+# Days after departure that completed and cancelled bookings move to the archive tables
+BOOKING_ARCHIVE_AFTER_DAYS = config('BOOKING_ARCHIVE_AFTER_DAYS', default=180, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
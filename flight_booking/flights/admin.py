@@ -1,5 +1,14 @@
 from django.contrib import admin
-from .models import Flight, Airport, Airline
+from .models import Flight, FlightLayover, Airport, Airline, RoutePopularity
+
+class FlightLayoverInline(admin.TabularInline):
+    model = FlightLayover
+    extra = 0
+    can_delete = False
+    readonly_fields = ('position', 'name', 'airport')
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 @admin.register(Flight)
 class FlightAdmin(admin.ModelAdmin):
@@ -10,13 +19,16 @@ class FlightAdmin(admin.ModelAdmin):
     list_editable = ('price', 'available_seats', 'is_active')
     date_hierarchy = 'departure_date'
     ordering = ('-departure_date', 'departure_time')
+    readonly_fields = ('origin_airport', 'destination_airport', 'stops')
+    inlines = [FlightLayoverInline]
+    actions = ['cancel_flights']
     
     fieldsets = (
         ('Flight Information', {
             'fields': ('airline', 'flight_number', 'aircraft')
         }),
         ('Route', {
-            'fields': ('origin', 'destination', 'layovers')
+            'fields': ('origin', 'destination', 'origin_airport', 'destination_airport', 'layovers', 'stops')
         }),
         ('Schedule', {
             'fields': ('departure_date', 'departure_time', 'arrival_date', 'arrival_time', 'duration')
@@ -29,6 +41,12 @@ class FlightAdmin(admin.ModelAdmin):
         })
     )
 
+    @admin.action(description='Cancel selected flights and their bookings')
+    def cancel_flights(self, request, queryset):
+        from bookings.services import cancel_flights
+        cancelled = cancel_flights(list(queryset.values_list('id', flat=True)))
+        self.message_user(request, f'Cancelled {queryset.count()} flights and {cancelled} bookings.')
+
 @admin.register(Airport)
 class AirportAdmin(admin.ModelAdmin):
     list_display = ('code', 'name', 'city', 'country', 'is_active')
@@ -43,4 +61,11 @@ class AirlineAdmin(admin.ModelAdmin):
     list_filter = ('is_active',)
     search_fields = ('name', 'code')
     list_editable = ('is_active',)
-    ordering = ('name',)
\ No newline at end of file
+    ordering = ('name',)
+
+@admin.register(RoutePopularity)
+class RoutePopularityAdmin(admin.ModelAdmin):
+    list_display = ('origin', 'destination', 'bookings', 'searches', 'score', 'refreshed_at')
+    search_fields = ('origin', 'destination')
+    readonly_fields = ('refreshed_at',)
+    ordering = ('-score',)
\ No newline at end of file
@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class FlightsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'flights'
\ No newline at end of file
+    name = 'flights'
+
+    def ready(self):
+        from . import signals  # noqa: F401
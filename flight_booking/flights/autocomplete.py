@@ -0,0 +1,136 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db.models import Count
+
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """Lowercase text and reduce it to space-separated words"""
+    return ' '.join(NON_WORD_RE.sub(' ', text.casefold()).split())
+
+
+def _index_keys(label):
+    """Return every word-boundary suffix of a label, so "york" and "jfk" both match it"""
+    words = normalize(label).split()
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class CityIndex:
+    """
+    Process-local prefix index over city and airport labels.
+
+    Keys are kept in a sorted list and searched with bisect, so a lookup
+    never touches the database. The index is built lazily from active
+    airports and flights, patched from model signals, and rebuilt after
+    CITY_INDEX_MAX_AGE seconds to pick up changes made by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built_at = None
+        self._refs = Counter()          # label -> flights and airports naming it
+        self._flights = Counter()       # label -> active flights from or to it
+        self._cities = defaultdict(set)  # city -> airport labels in that city
+        self._keys = []                 # sorted (key, label) pairs
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def build(self):
+        from .models import Airport, Flight
+
+        with self._lock:
+            self._refs.clear()
+            self._flights.clear()
+            self._cities.clear()
+            self._keys = []
+            for city, code in Airport.objects.filter(is_active=True).values_list('city', 'code'):
+                self.add_airport(city, code)
+            for field in ('origin', 'destination'):
+                counts = Flight.objects.filter(is_active=True).order_by().values(field).annotate(
+                    flights=Count('id'))
+                for row in counts:
+                    self._add(row[field], row['flights'])
+            self._built_at = time.monotonic()
+
+    def _ensure_built(self):
+        if self._built_at is None or time.monotonic() - self._built_at > settings.CITY_INDEX_MAX_AGE:
+            self.build()
+
+    def _add(self, label, flights=0):
+        if not label:
+            return
+        if not self._refs[label]:
+            for key in _index_keys(label):
+                insort(self._keys, (key, label))
+        self._refs[label] += max(flights, 1)
+        self._flights[label] += flights
+
+    def _remove(self, label, flights=0):
+        if not self._refs.get(label):
+            return
+        self._refs[label] -= max(flights, 1)
+        self._flights[label] -= flights
+        if self._refs[label] <= 0:
+            del self._refs[label]
+            self._flights.pop(label, None)
+            for key in _index_keys(label):
+                i = bisect_left(self._keys, (key, label))
+                if i < len(self._keys) and self._keys[i] == (key, label):
+                    del self._keys[i]
+
+    def add_airport(self, city, code):
+        with self._lock:
+            label = f'{city} ({code})'
+            self._add(label)
+            self._add(city)
+            self._cities[city].add(label)
+
+    def remove_airport(self, city, code):
+        with self._lock:
+            label = f'{city} ({code})'
+            self._remove(label)
+            self._remove(city)
+            self._cities[city].discard(label)
+
+    def add_flight(self, origin, destination):
+        with self._lock:
+            self._add(origin, 1)
+            self._add(destination, 1)
+
+    def remove_flight(self, origin, destination):
+        with self._lock:
+            self._remove(origin, 1)
+            self._remove(destination, 1)
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def popularity(self, label):
+        """Active flights through a label, summed over a city's airports"""
+        return self._flights[label] + sum(self._flights[airport] for airport in self._cities.get(label, ()))
+
+    def search(self, term, limit=10):
+        """Return up to limit labels with a word starting with term, most popular first"""
+        prefix = normalize(term)
+        if not prefix:
+            return []
+        with self._lock:
+            self._ensure_built()
+            labels = set()
+            i = bisect_left(self._keys, (prefix,))
+            while i < len(self._keys) and self._keys[i][0].startswith(prefix):
+                labels.add(self._keys[i][1])
+                i += 1
+            return sorted(labels, key=lambda label: (-self.popularity(label), label))[:limit]
+
+
+city_index = CityIndex()
@@ -0,0 +1,59 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+
+# Generation counters are never expired; cached entries embed the generation
+# they were computed under, so bumping it orphans them all at once.
+GENERATION_TIMEOUT = None
+
+
+def _generation_key(scope):
+    return f'flights:gen:{scope}'
+
+
+def _new_generation():
+    # Start from a clock value so a generation key that was evicted never
+    # comes back at a number older entries were stored under.
+    return time.time_ns()
+
+
+def get_generation(scope):
+    """Return the current cache generation for a scope"""
+    return cache.get_or_set(_generation_key(scope), _new_generation, GENERATION_TIMEOUT)
+
+
+def get_generations(scopes):
+    """Return the current generations for several scopes in one cache round trip"""
+    keys = {_generation_key(scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        found[key] = get_generation(keys[key])
+    return tuple(found[key] for key in keys)
+
+
+def bump_generation(scope):
+    """Invalidate every cache entry built under the scope's current generation"""
+    key = _generation_key(scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_generation(), GENERATION_TIMEOUT)
+
+
+def make_key(prefix, scope, *parts):
+    """Build a cache key for parts, tied to the scope's current generation"""
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return f'flights:{prefix}:{get_generation(scope)}:{digest}'
+
+
+def date_scope(departure_date):
+    return f'date:{departure_date}'
+
+
+def invalidate_flight(flight):
+    """Drop cached data that may include this flight"""
+    loaded = getattr(flight, '_loaded_values', {})
+    dates = {flight.departure_date, loaded.get('departure_date')}
+    for departure_date in dates - {None}:
+        bump_generation(date_scope(departure_date))
@@ -1,12 +1,25 @@
 from django import forms
-from datetime import date, timedelta
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, time, timedelta
 from .models import Flight
+from .search import FARE_CALENDAR_MAX_DAYS, resolve_airport_codes
 
 class FlightSearchForm(forms.Form):
     TRIP_CHOICES = [
         ('one-way', 'One Way'),
         ('round-trip', 'Round Trip'),
     ]
+    SORT_CHOICES = [
+        ('departure', 'Departure time'),
+        ('price', 'Lowest price'),
+        ('duration', 'Shortest duration'),
+    ]
+    STOPS_CHOICES = [
+        ('', 'Any stops'),
+        (0, 'Direct only'),
+        (1, 'Up to 1 stop'),
+        (2, 'Up to 2 stops'),
+    ]
     
     origin = forms.CharField(
         max_length=100,
@@ -54,6 +67,44 @@ class FlightSearchForm(forms.Form):
         initial='one-way',
         widget=forms.Select(attrs={'class': 'form-control'})
     )
+    sort = forms.ChoiceField(
+        choices=SORT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    max_price = forms.DecimalField(
+        required=False,
+        min_value=0,
+        decimal_places=2,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control form-control-sm',
+            'placeholder': 'Max price',
+            'step': '1'
+        })
+    )
+    max_duration = forms.IntegerField(
+        required=False,
+        min_value=1,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control form-control-sm',
+            'placeholder': 'Max hours'
+        })
+    )
+    depart_after = forms.TimeField(
+        required=False,
+        widget=forms.TimeInput(attrs={'class': 'form-control form-control-sm', 'type': 'time'})
+    )
+    depart_before = forms.TimeField(
+        required=False,
+        widget=forms.TimeInput(attrs={'class': 'form-control form-control-sm', 'type': 'time'})
+    )
+    max_stops = forms.TypedChoiceField(
+        choices=STOPS_CHOICES,
+        coerce=int,
+        empty_value=None,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
 
     def clean(self):
         cleaned_data = super().clean()
@@ -64,6 +115,12 @@ class FlightSearchForm(forms.Form):
         if departure_date and departure_date < date.today():
             raise forms.ValidationError("Departure date cannot be in the past.")
 
+        # Resolve places to airport codes up front so the search can use the
+        # indexed airport foreign keys instead of substring matching.
+        for field in ('origin', 'destination'):
+            if cleaned_data.get(field):
+                cleaned_data[f'{field}_codes'] = resolve_airport_codes(cleaned_data[field])
+
         if trip_type == 'round-trip':
             if not return_date:
                 raise forms.ValidationError("Return date is required for round trip.")
@@ -72,6 +129,70 @@ class FlightSearchForm(forms.Form):
 
         return cleaned_data
 
+    def search_filters(self):
+        """Sort and filter options for search_flights, from cleaned data"""
+        data = self.cleaned_data
+        filters = {
+            'sort': data.get('sort') or 'departure',
+            'max_price': data.get('max_price'),
+            'max_duration': data['max_duration'] * 60 if data.get('max_duration') else None,
+            'depart_after': data.get('depart_after'),
+            'depart_before': data.get('depart_before'),
+            'max_stops': data.get('max_stops'),
+        }
+        return {key: value for key, value in filters.items() if value is not None}
+
+class FareCalendarForm(forms.Form):
+    origin = forms.CharField(max_length=100)
+    destination = forms.CharField(max_length=100)
+    date = forms.DateField()
+    days = forms.IntegerField(min_value=0, max_value=FARE_CALENDAR_MAX_DAYS, required=False)
+    passengers = forms.IntegerField(min_value=1, max_value=9, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('days') is None:
+            cleaned_data['days'] = 3
+        if cleaned_data.get('passengers') is None:
+            cleaned_data['passengers'] = 1
+        for field in ('origin', 'destination'):
+            if cleaned_data.get(field):
+                cleaned_data[f'{field}_codes'] = resolve_airport_codes(cleaned_data[field])
+        return cleaned_data
+
+class FlightSearchAPIForm(forms.Form):
+    origin = forms.CharField(max_length=100)
+    destination = forms.CharField(max_length=100)
+    departure_date = forms.DateField()
+    passengers = forms.IntegerField(min_value=1, max_value=9, required=False)
+    limit = forms.IntegerField(min_value=1, max_value=100, required=False)
+    cursor = forms.CharField(max_length=100, required=False)
+
+    def clean_cursor(self):
+        cursor = self.cleaned_data['cursor']
+        if not cursor:
+            return None
+        try:
+            departure_time, flight_id = urlsafe_b64decode(cursor.encode()).decode().split(',')
+            return time.fromisoformat(departure_time), int(flight_id)
+        except ValueError:
+            raise forms.ValidationError("Invalid cursor.")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('passengers') is None:
+            cleaned_data['passengers'] = 1
+        if cleaned_data.get('limit') is None:
+            cleaned_data['limit'] = 20
+        for field in ('origin', 'destination'):
+            if cleaned_data.get(field):
+                cleaned_data[f'{field}_codes'] = resolve_airport_codes(cleaned_data[field])
+        return cleaned_data
+
+    @staticmethod
+    def encode_cursor(departure_time, flight_id):
+        return urlsafe_b64encode(f'{departure_time.isoformat()},{flight_id}'.encode()).decode()
+
 class FlightForm(forms.ModelForm):
     class Meta:
         model = Flight
@@ -0,0 +1,82 @@
+"""
+Full-text search over small per-object documents.
+
+Each searchable model has a document table holding one text blob per
+object. On SQLite an FTS5 table with the trigram tokenizer mirrors the
+documents through triggers, so a search is a case-insensitive substring
+match answered from the index. On PostgreSQL a pg_trgm GIN index on the
+documents serves the same icontains lookup. Other databases scan the
+document table, which still avoids the joins of searching the models.
+"""
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import FlightSearchDocument
+
+# Shortest query a trigram index can answer; shorter ones scan the documents
+TRIGRAM_MIN_LENGTH = 3
+
+
+def index_sql(table, vendor):
+    """Statements creating and filling the full-text index of a document table"""
+    if vendor == 'sqlite':
+        fts = f'{table}_fts'
+        return [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5(text, content='{table}', content_rowid='id', "
+            f"tokenize='trigram')",
+            f"CREATE TRIGGER {table}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END",
+            f"CREATE TRIGGER {table}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.id, old.text); END",
+            f"CREATE TRIGGER {table}_au AFTER UPDATE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, text) VALUES ('delete', old.id, old.text); "
+            f"INSERT INTO {fts}(rowid, text) VALUES (new.id, new.text); END",
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+        ]
+    if vendor == 'postgresql':
+        return [
+            'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+            f'CREATE INDEX {table}_text_trgm ON {table} USING gin (UPPER(text) gin_trgm_ops)',
+        ]
+    return []
+
+
+def drop_index_sql(table, vendor):
+    if vendor == 'sqlite':
+        return [f'DROP TRIGGER {table}_{suffix}' for suffix in ('ai', 'ad', 'au')] + [f'DROP TABLE {table}_fts']
+    if vendor == 'postgresql':
+        return [f'DROP INDEX {table}_text_trgm']
+    return []
+
+
+def save_documents(model, field, texts):
+    """Create or replace the documents of {object id: text} with one upsert"""
+    model.objects.bulk_create(
+        [model(**{f'{field}_id': object_id, 'text': text}) for object_id, text in texts.items()],
+        update_conflicts=True, unique_fields=[field], update_fields=['text'],
+    )
+
+
+def matching(model, field, query):
+    """Subquery of the ids of objects whose document contains query, ignoring case"""
+    documents = model.objects.all()
+    if connection.vendor == 'sqlite' and len(query) >= TRIGRAM_MIN_LENGTH:
+        fts = f'{model._meta.db_table}_fts'
+        phrase = '"' + query.replace('"', '""') + '"'
+        documents = documents.filter(id__in=RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s', [phrase]))
+    else:
+        documents = documents.filter(text__icontains=query)
+    return documents.values(field)
+
+
+def flight_text(flight):
+    return '\n'.join([flight.flight_number, flight.airline, flight.origin, flight.destination])
+
+
+def index_flights(flights):
+    save_documents(FlightSearchDocument, 'flight', {flight.id: flight_text(flight) for flight in flights})
+
+
+def match_flights(flights, query):
+    """Narrow a Flight queryset to flights whose number, airline, origin or destination contains query"""
+    return flights.filter(id__in=matching(FlightSearchDocument, 'flight', query))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from flights.popularity import refresh_route_popularity
+
+
+class Command(BaseCommand):
+    help = ('Rank routes by recent bookings and searches for the home page. '
+            'Run periodically, e.g. from cron every 15 minutes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30,
+                            help='Count bookings made in the last DAYS days (default: 30).')
+        parser.add_argument('--decay', type=float, default=0.5,
+                            help='Factor applied to accumulated search counts on each run (default: 0.5).')
+
+    def handle(self, *args, **options):
+        routes = refresh_route_popularity(days=options['days'], decay=options['decay'])
+        self.stdout.write(self.style.SUCCESS(f'Ranked {routes} routes.'))
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:15
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Airline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('code', models.CharField(max_length=10, unique=True)),
+                ('logo', models.ImageField(blank=True, null=True, upload_to='airlines/')),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Airport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=10, unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('city', models.CharField(max_length=100)),
+                ('country', models.CharField(max_length=100)),
+                ('timezone', models.CharField(default='UTC', max_length=50)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['city', 'name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Flight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('airline', models.CharField(max_length=100)),
+                ('flight_number', models.CharField(max_length=20, unique=True)),
+                ('origin', models.CharField(max_length=100)),
+                ('destination', models.CharField(max_length=100)),
+                ('departure_time', models.TimeField()),
+                ('arrival_time', models.TimeField()),
+                ('departure_date', models.DateField()),
+                ('arrival_date', models.DateField()),
+                ('duration', models.CharField(max_length=20)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(0)])),
+                ('total_seats', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(500)])),
+                ('available_seats', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(0)])),
+                ('aircraft', models.CharField(max_length=100)),
+                ('layovers', models.TextField(blank=True, help_text='Comma-separated list of layover cities')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['departure_date', 'departure_time'],
+                'indexes': [models.Index(fields=['origin', 'destination', 'departure_date'], name='flights_fli_origin_5cad99_idx'), models.Index(fields=['departure_date'], name='flights_fli_departu_60abbf_idx'), models.Index(fields=['is_active'], name='flights_fli_is_acti_2185d0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='destination_airport',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='arriving_flights', to='flights.airport'),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='origin_airport',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='departing_flights', to='flights.airport'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['origin_airport', 'destination_airport', 'departure_date'], name='flights_fli_origin__f9bd94_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+import re
+
+from django.db import migrations
+
+AIRPORT_LABEL_RE = re.compile(r'^\s*(?P<city>.*?)\s*\((?P<code>[A-Za-z0-9]{3,4})\)\s*$')
+
+
+def backfill_flight_airports(apps, schema_editor):
+    """Link every flight to airports parsed from its "City (CODE)" labels"""
+    Airport = apps.get_model('flights', 'Airport')
+    Flight = apps.get_model('flights', 'Flight')
+
+    airports = {airport.code: airport for airport in Airport.objects.all()}
+    for label_field, airport_field in (('origin', 'origin_airport'),
+                                       ('destination', 'destination_airport')):
+        labels = Flight.objects.filter(**{airport_field: None}).order_by().values_list(
+            label_field, flat=True).distinct()
+        for label in labels:
+            match = AIRPORT_LABEL_RE.match(label)
+            if not match:
+                continue
+            code = match.group('code').upper()
+            if code not in airports:
+                city = match.group('city') or code
+                # The timezone is left blank: unknown until an admin sets it.
+                airports[code] = Airport.objects.create(code=code, name=f'{city} ({code})', city=city, timezone='')
+            Flight.objects.filter(**{label_field: label, airport_field: None}).update(
+                **{airport_field: airports[code]})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0002_flight_airports'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_flight_airports, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0003_backfill_flight_airports'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoutePopularity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin', models.CharField(max_length=100)),
+                ('destination', models.CharField(max_length=100)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'route popularity',
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['-score'], name='flights_rou_score_a908f2_idx')],
+                'constraints': [models.UniqueConstraint(fields=('origin', 'destination'), name='unique_route_popularity')],
+            },
+        ),
+    ]
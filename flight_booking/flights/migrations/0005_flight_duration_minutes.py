@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0004_routepopularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, help_text='Computed from the schedule in airport local times'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ValueError, ZoneInfoNotFoundError):
+        return ZoneInfo('UTC')
+
+
+def backfill_duration_minutes(apps, schema_editor):
+    """Compute duration_minutes for existing flights from their schedules"""
+    Airport = apps.get_model('flights', 'Airport')
+    Flight = apps.get_model('flights', 'Flight')
+
+    zones = {airport_id: _zone(tz) for airport_id, tz in Airport.objects.values_list('id', 'timezone')}
+    utc = ZoneInfo('UTC')
+    batch = []
+    for flight in Flight.objects.order_by('id').iterator(chunk_size=BATCH_SIZE):
+        departs = datetime.combine(flight.departure_date, flight.departure_time,
+                                   tzinfo=zones.get(flight.origin_airport_id, utc))
+        arrives = datetime.combine(flight.arrival_date, flight.arrival_time,
+                                   tzinfo=zones.get(flight.destination_airport_id, utc))
+        flight.duration_minutes = max(int((arrives - departs).total_seconds() // 60), 0)
+        batch.append(flight)
+        if len(batch) >= BATCH_SIZE:
+            Flight.objects.bulk_update(batch, ['duration_minutes'])
+            batch = []
+    if batch:
+        Flight.objects.bulk_update(batch, ['duration_minutes'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0005_flight_duration_minutes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_duration_minutes, migrations.RunPython.noop),
+    ]
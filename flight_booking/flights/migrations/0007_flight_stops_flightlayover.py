@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0006_backfill_flight_duration_minutes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='stops',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='FlightLayover',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('airport', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='layovers', to='flights.airport')),
+                ('flight', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='layover_stops', to='flights.flight')),
+            ],
+            options={
+                'ordering': ['position'],
+                'constraints': [models.UniqueConstraint(fields=('flight', 'position'), name='unique_flight_layover_position')],
+            },
+        ),
+    ]
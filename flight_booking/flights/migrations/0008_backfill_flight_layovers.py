@@ -0,0 +1,42 @@
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+AIRPORT_CODE_RE = re.compile(r'\(([A-Za-z0-9]{3,4})\)\s*$')
+
+
+def backfill_flight_layovers(apps, schema_editor):
+    """Split Flight.layovers into FlightLayover rows and set Flight.stops"""
+    Airport = apps.get_model('flights', 'Airport')
+    Flight = apps.get_model('flights', 'Flight')
+    FlightLayover = apps.get_model('flights', 'FlightLayover')
+
+    airports = {airport.code: airport for airport in Airport.objects.all()}
+    flights, stops = [], []
+    for flight in Flight.objects.exclude(layovers='').order_by('id').iterator(chunk_size=BATCH_SIZE):
+        names = [name.strip() for name in flight.layovers.split(',') if name.strip()]
+        flight.stops = len(names)
+        flights.append(flight)
+        for position, name in enumerate(names, start=1):
+            match = AIRPORT_CODE_RE.search(name)
+            airport = airports.get(match.group(1).upper()) if match else None
+            stops.append(FlightLayover(flight=flight, position=position, name=name, airport=airport))
+        if len(flights) >= BATCH_SIZE:
+            Flight.objects.bulk_update(flights, ['stops'])
+            FlightLayover.objects.bulk_create(stops)
+            flights, stops = [], []
+    if flights:
+        Flight.objects.bulk_update(flights, ['stops'])
+        FlightLayover.objects.bulk_create(stops)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0007_flight_stops_flightlayover'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_flight_layovers, migrations.RunPython.noop),
+    ]
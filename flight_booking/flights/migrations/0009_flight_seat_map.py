@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0008_backfill_flight_layovers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flight',
+            name='seat_map',
+            field=models.BinaryField(default=b'', help_text='One bit per seat, set when the seat is taken'),
+        ),
+    ]
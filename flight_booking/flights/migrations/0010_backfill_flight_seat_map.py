@@ -0,0 +1,88 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+from flights.seatmap import SeatMap, layout_for
+
+BATCH_SIZE = 1000
+
+# Bookings whose passengers occupy seats
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+
+def _seat_flight(flight, passengers):
+    """
+    Build a flight's seat map from its booked passengers and return the
+    passengers whose seat_number changed.
+
+    A passenger's seat is kept when it exists and nobody else has it; the
+    others are given free seats, front rows first, so cancelling the
+    booking later frees exactly the seats it holds. Any seats sold with no
+    passenger to show for them are also marked, so the map agrees with
+    available_seats.
+    """
+    seat_map = SeatMap(layout_for(flight.aircraft, flight.total_seats), flight.total_seats)
+    unseated = []
+    for passenger in passengers:
+        try:
+            index = seat_map.index(passenger.seat_number)
+        except ValueError:
+            index = None
+        if index is None or seat_map.is_taken(index):
+            unseated.append(passenger)
+        else:
+            seat_map.take([index])
+    free = (index for index in range(flight.total_seats) if not seat_map.is_taken(index))
+    changed = []
+    for passenger in unseated:
+        index = next(free, None)
+        if index is None:
+            break
+        seat_map.take([index])
+        passenger.seat_number = seat_map.label(index)
+        changed.append(passenger)
+    taken = sum(bin(byte).count('1') for byte in seat_map.bits)
+    seat_map.take(index for index, _ in zip(free, range(flight.total_seats - flight.available_seats - taken)))
+    flight.seat_map = seat_map.to_bytes()
+    return changed
+
+
+def _backfill_batch(Flight, Passenger, flights):
+    passengers = defaultdict(list)
+    for passenger in Passenger.objects.filter(
+            booking__flight__in=flights, booking__status__in=ACTIVE_STATUSES).select_related('booking').only(
+            'seat_number', 'booking__flight_id').order_by('booking_id', 'id'):
+        passengers[passenger.booking.flight_id].append(passenger)
+    changed = []
+    for flight in flights:
+        changed.extend(_seat_flight(flight, passengers[flight.id]))
+    Flight.objects.bulk_update(flights, ['seat_map'])
+    Passenger.objects.bulk_update(changed, ['seat_number'], batch_size=BATCH_SIZE)
+
+
+def backfill_seat_maps(apps, schema_editor):
+    """Mark booked seats as taken and give every booked passenger a seat on the map"""
+    Flight = apps.get_model('flights', 'Flight')
+    Passenger = apps.get_model('bookings', 'Passenger')
+
+    batch = []
+    flights = Flight.objects.only('aircraft', 'total_seats', 'available_seats').order_by('id')
+    for flight in flights.iterator(chunk_size=BATCH_SIZE):
+        batch.append(flight)
+        if len(batch) >= BATCH_SIZE:
+            _backfill_batch(Flight, Passenger, batch)
+            batch = []
+    if batch:
+        _backfill_batch(Flight, Passenger, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0009_flight_seat_map'),
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_seat_maps, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0010_backfill_flight_seat_map'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField()),
+                ('flight', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='flights.flight')),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+from flights.fulltext import drop_index_sql, index_sql
+
+BATCH_SIZE = 1000
+
+
+def build_search_index(apps, schema_editor):
+    """Write a search document for every flight, then build the full-text index over them"""
+    Flight = apps.get_model('flights', 'Flight')
+    FlightSearchDocument = apps.get_model('flights', 'FlightSearchDocument')
+
+    batch = []
+    flights = Flight.objects.only('flight_number', 'airline', 'origin', 'destination').order_by('id')
+    for flight in flights.iterator(chunk_size=BATCH_SIZE):
+        batch.append(FlightSearchDocument(flight=flight, text='\n'.join(
+            [flight.flight_number, flight.airline, flight.origin, flight.destination])))
+        if len(batch) >= BATCH_SIZE:
+            FlightSearchDocument.objects.bulk_create(batch)
+            batch = []
+    FlightSearchDocument.objects.bulk_create(batch)
+
+    for sql in index_sql(FlightSearchDocument._meta.db_table, schema_editor.connection.vendor):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    FlightSearchDocument = apps.get_model('flights', 'FlightSearchDocument')
+    for sql in drop_index_sql(FlightSearchDocument._meta.db_table, schema_editor.connection.vendor):
+        schema_editor.execute(sql)
+    FlightSearchDocument.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0011_flightsearchdocument'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0012_flight_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['created_at', 'id'], name='flights_fli_created_e166fa_idx'),
+        ),
+    ]
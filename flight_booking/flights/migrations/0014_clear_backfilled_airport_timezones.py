@@ -0,0 +1,22 @@
+from django.db import migrations
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+
+
+def clear_backfilled_timezones(apps, schema_editor):
+    """Blank the placeholder UTC timezone of airports 0003 created from flight labels"""
+    Airport = apps.get_model('flights', 'Airport')
+    Airport.objects.filter(
+        country='', timezone='UTC', name=Concat(F('city'), Value(' ('), F('code'), Value(')')),
+    ).update(timezone='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flights', '0013_flight_created_at_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_backfilled_timezones, migrations.RunPython.noop),
+    ]
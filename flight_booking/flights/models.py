@@ -1,21 +1,50 @@
-from django.db import models
+import re
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import DatabaseError, connection, models, transaction
+from django.db.models import F
+from django.db.models.functions import Least
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+from .cache import invalidate_flight
+from .seatmap import SeatMap
+
+AIRPORT_CODE_RE = re.compile(r'\(([A-Za-z0-9]{3,4})\)\s*$')
+
+# Fields that determine a flight's duration
+SCHEDULE_FIELDS = ('departure_date', 'departure_time', 'arrival_date', 'arrival_time',
+                   'origin_airport_id', 'destination_airport_id')
+
+# Attempts at swapping in a new seat map before giving up under contention,
+# on backends that cannot lock the flight row
+SEAT_CLAIM_RETRIES = 10
 
 class Flight(models.Model):
     airline = models.CharField(max_length=100)
     flight_number = models.CharField(max_length=20, unique=True)
     origin = models.CharField(max_length=100)
     destination = models.CharField(max_length=100)
+    origin_airport = models.ForeignKey('Airport', on_delete=models.PROTECT, null=True, blank=True,
+                                       related_name='departing_flights')
+    destination_airport = models.ForeignKey('Airport', on_delete=models.PROTECT, null=True, blank=True,
+                                            related_name='arriving_flights')
     departure_time = models.TimeField()
     arrival_time = models.TimeField()
     departure_date = models.DateField()
     arrival_date = models.DateField()
     duration = models.CharField(max_length=20)
+    duration_minutes = models.PositiveIntegerField(default=0, db_index=True, editable=False,
+                                                   help_text="Computed from the schedule in airport local times")
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     total_seats = models.PositiveIntegerField(validators=[MinValueValidator(1), MaxValueValidator(500)])
     available_seats = models.PositiveIntegerField(validators=[MinValueValidator(0)])
+    seat_map = models.BinaryField(default=b'', editable=False,
+                                  help_text="One bit per seat, set when the seat is taken")
     aircraft = models.CharField(max_length=100)
     layovers = models.TextField(blank=True, help_text="Comma-separated list of layover cities")
+    stops = models.PositiveSmallIntegerField(default=0, db_index=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -24,24 +53,214 @@ class Flight(models.Model):
         ordering = ['departure_date', 'departure_time']
         indexes = [
             models.Index(fields=['origin', 'destination', 'departure_date']),
+            models.Index(fields=['origin_airport', 'destination_airport', 'departure_date']),
             models.Index(fields=['departure_date']),
             models.Index(fields=['is_active']),
+            models.Index(fields=['created_at', 'id']),
         ]
 
     def __str__(self):
         return f"{self.airline} {self.flight_number} - {self.origin} to {self.destination}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so a rescheduled flight also clears the
+        # cached searches for the day it moved away from, and a renamed route
+        # gets its airports resolved again.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.resolve_airports()
+        loaded = getattr(self, '_loaded_values', {})
+        if not self.duration_minutes or any(loaded.get(field) != getattr(self, field) for field in SCHEDULE_FIELDS):
+            self.duration_minutes = self.compute_duration_minutes()
+        layovers_changed = loaded.get('layovers') != self.layovers
+        self.stops = len(self.parse_layovers(self.layovers))
+        counts_changed = self.pk and any(loaded.get(field) != getattr(self, field)
+                                         for field in ('available_seats', 'total_seats'))
+        if counts_changed or (not self.seat_map and self.available_seats < self.total_seats):
+            self.rebuild_seat_map()
+        super().save(*args, **kwargs)
+        if layovers_changed:
+            self.sync_layover_stops()
+
+    def reserve_seats(self, count, seats=()):
+        """
+        Take count seats: the requested seat labels plus adjacent free seats.
+
+        The flight row is locked while the new map is computed, where the
+        backend supports it, so each booking writes once. The write is also a
+        conditional UPDATE that only matches the map it was computed from,
+        so concurrent bookings can never claim the same seat or oversell the
+        flight. Returns the seat labels taken, or None, changing nothing,
+        when they are unavailable or the flight is not active. Raises
+        ValueError for a seat label that does not exist or a count that is
+        not positive.
+        """
+        if count <= 0:
+            raise ValueError(f'Cannot reserve {count} seats.')
+        for _ in range(SEAT_CLAIM_RETRIES):
+            with transaction.atomic(savepoint=False):
+                current, available, is_active = self._lock_seats('seat_map', 'available_seats', 'is_active')
+                current = bytes(current)
+                seat_map = SeatMap.for_flight(self, current)
+                indexes = seat_map.choose(count, seats) if is_active and available >= count else None
+                if indexes is None:
+                    return None
+                seat_map.take(indexes)
+                reserved = Flight.objects.filter(pk=self.pk, seat_map=current, available_seats__gte=count,
+                                                 is_active=True).update(
+                    seat_map=seat_map.to_bytes(),
+                    available_seats=F('available_seats') - count,
+                    updated_at=timezone.now(),
+                )
+                if reserved:
+                    self._seats_changed()
+                    return [seat_map.label(index) for index in indexes]
+        return None
+
+    def release_seats(self, count, seats=()):
+        """
+        Return count seats to the flight, freeing the given seat labels.
+
+        Raises DatabaseError when the seat map keeps changing underneath
+        for SEAT_CLAIM_RETRIES attempts, so the caller's transaction rolls
+        back rather than losing the seats.
+        """
+        if count <= 0:
+            raise ValueError(f'Cannot release {count} seats.')
+        for _ in range(SEAT_CLAIM_RETRIES):
+            with transaction.atomic(savepoint=False):
+                current = bytes(self._lock_seats('seat_map')[0])
+                seat_map = SeatMap.for_flight(self, current)
+                seat_map.release(seat_map.indexes(seats))
+                if Flight.objects.filter(pk=self.pk, seat_map=current).update(
+                        seat_map=seat_map.to_bytes(),
+                        available_seats=Least(F('available_seats') + count, F('total_seats')),
+                        updated_at=timezone.now()):
+                    self._seats_changed()
+                    return
+        raise DatabaseError(f'Seats on flight {self.pk} could not be released under contention.')
+
+    def move_seats(self, release, claim):
+        """
+        Swap already-taken seats for others in one conditional UPDATE.
+
+        The seat count is unchanged. Returns False, changing nothing, when a
+        seat in claim is taken by someone else.
+        """
+        for _ in range(SEAT_CLAIM_RETRIES):
+            with transaction.atomic(savepoint=False):
+                current = bytes(self._lock_seats('seat_map')[0])
+                seat_map = SeatMap.for_flight(self, current)
+                seat_map.release(seat_map.indexes(release))
+                indexes = seat_map.choose(len(claim), claim)
+                if indexes is None:
+                    return False
+                seat_map.take(indexes)
+                if Flight.objects.filter(pk=self.pk, seat_map=current).update(
+                        seat_map=seat_map.to_bytes(), updated_at=timezone.now()):
+                    self._seats_changed()
+                    return True
+        return False
+
+    def _lock_seats(self, *fields):
+        # Must run inside a transaction. Without row locks (SQLite) the
+        # conditional UPDATE that follows is what keeps writers apart.
+        flights = Flight.objects.filter(pk=self.pk)
+        if connection.features.has_select_for_update:
+            flights = flights.select_for_update()
+        return flights.values_list(*fields).get()
+
+    def occupied_seats(self):
+        """Seat labels held by passengers of open bookings or by seat holds"""
+        from bookings.models import Passenger, SeatHold
+
+        seats = list(Passenger.objects.filter(
+            booking__flight=self, booking__status__in=['pending', 'confirmed']
+        ).exclude(seat_number='').values_list('seat_number', flat=True))
+        for seat_numbers in SeatHold.objects.filter(flight=self).values_list('seat_numbers', flat=True):
+            seats.extend(seat for seat in seat_numbers.split(',') if seat)
+        return seats
+
+    def rebuild_seat_map(self):
+        """
+        Rebuild the seat map from the seats passengers and holds occupy.
+
+        Used when available_seats or total_seats are edited directly, e.g.
+        in the admin: seats sold beyond the occupied ones take the front
+        rows, and available_seats is lowered if it promises seats that are
+        occupied, so every seat the counter offers can actually be booked.
+        """
+        seat_map = SeatMap.for_flight(self, b'')
+        seat_map.take(seat_map.indexes(self.occupied_seats() if self.pk else []))
+        occupied = sum(1 for index in range(self.total_seats) if seat_map.is_taken(index))
+        self.available_seats = max(min(self.available_seats, self.total_seats - occupied), 0)
+        free = (index for index in range(self.total_seats) if not seat_map.is_taken(index))
+        seat_map.take([index for index, _ in zip(free, range(self.total_seats - self.available_seats - occupied))])
+        self.seat_map = seat_map.to_bytes()
+
+    def _seats_changed(self):
+        # Queryset updates skip post_save, so clear cached searches here,
+        # once the change is committed: bumping the generation earlier would
+        # let a concurrent search cache the old seat counts under the new one.
+        transaction.on_commit(lambda: invalidate_flight(self))
+
+    @staticmethod
+    def parse_layovers(layovers):
+        return [layover.strip() for layover in (layovers or '').split(',') if layover.strip()]
+
+    def sync_layover_stops(self):
+        """Rebuild the FlightLayover rows from the comma-separated layovers"""
+        names = self.parse_layovers(self.layovers)
+        codes = {name: Airport.code_from_label(name) for name in names}
+        wanted = [code for code in codes.values() if code]
+        airports = Airport.objects.in_bulk(wanted, field_name='code') if wanted else {}
+        self.layover_stops.all().delete()
+        FlightLayover.objects.bulk_create(
+            FlightLayover(flight=self, position=position, name=name, airport=airports.get(codes[name]))
+            for position, name in enumerate(names, start=1)
+        )
+        getattr(self, '_prefetched_objects_cache', {}).pop('layover_stops', None)
+
+    def compute_duration_minutes(self):
+        """Minutes between departure and arrival, using each airport's timezone when known"""
+        departs = datetime.combine(self.departure_date, self.departure_time,
+                                   tzinfo=Airport.zone_for(self.origin_airport))
+        arrives = datetime.combine(self.arrival_date, self.arrival_time,
+                                   tzinfo=Airport.zone_for(self.destination_airport))
+        return max(int((arrives - departs).total_seconds() // 60), 0)
+
+    def resolve_airports(self):
+        """Link origin/destination airports from the "City (CODE)" labels"""
+        loaded = getattr(self, '_loaded_values', {})
+        for label_field, airport_field in (('origin', 'origin_airport'),
+                                           ('destination', 'destination_airport')):
+            label = getattr(self, label_field)
+            if getattr(self, f'{airport_field}_id') and loaded.get(label_field) == label:
+                continue
+            code = Airport.code_from_label(label)
+            airport = Airport.objects.filter(code=code).first() if code else None
+            setattr(self, airport_field, airport)
+
     @property
     def layover_list(self):
         """Return layovers as a list"""
-        if self.layovers:
-            return [layover.strip() for layover in self.layovers.split(',') if layover.strip()]
-        return []
+        if 'layover_stops' in getattr(self, '_prefetched_objects_cache', {}):
+            return [stop.name for stop in self.layover_stops.all()]
+        return self.parse_layovers(self.layovers)
 
     @property
     def is_direct(self):
         """Check if flight is direct (no layovers)"""
-        return len(self.layover_list) == 0
+        return self.stops == 0
+
+    @property
+    def seat_rows(self):
+        """Seat map rows for display, read from the flight row already loaded"""
+        return SeatMap.for_flight(self).rows()
 
     @property
     def seats_booked(self):
@@ -59,6 +278,29 @@ class Flight(models.Model):
         from django.core.exceptions import ValidationError
         if self.available_seats > self.total_seats:
             raise ValidationError('Available seats cannot exceed total seats.')
+        if self.pk:
+            seat_map = SeatMap.for_flight(self, b'')
+            occupied = len(set(seat_map.indexes(self.occupied_seats())))
+            if self.available_seats > self.total_seats - occupied:
+                raise ValidationError(f'{occupied} seats are booked or held, so at most '
+                                      f'{self.total_seats - occupied} can be available.')
+
+class FlightLayover(models.Model):
+    """One stop of a flight, kept in sync with Flight.layovers on save"""
+    flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name='layover_stops')
+    position = models.PositiveSmallIntegerField()
+    name = models.CharField(max_length=100)
+    airport = models.ForeignKey('Airport', on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='layovers')
+
+    class Meta:
+        ordering = ['position']
+        constraints = [
+            models.UniqueConstraint(fields=['flight', 'position'], name='unique_flight_layover_position'),
+        ]
+
+    def __str__(self):
+        return f"{self.flight.flight_number} stop {self.position}: {self.name}"
 
 class Airport(models.Model):
     """Model to store airport information"""
@@ -75,6 +317,25 @@ class Airport(models.Model):
     def __str__(self):
         return f"{self.city} ({self.code})"
 
+    @staticmethod
+    def zone_for(airport):
+        """Return the airport's timezone, or UTC when it is unknown"""
+        return (Airport.parse_zone(airport.timezone) if airport else None) or ZoneInfo('UTC')
+
+    @staticmethod
+    def parse_zone(name):
+        """The ZoneInfo for a timezone name, or None when it is blank or not a known zone"""
+        try:
+            return ZoneInfo(name) if name else None
+        except (ValueError, ZoneInfoNotFoundError):
+            return None
+
+    @staticmethod
+    def code_from_label(label):
+        """Extract the airport code from a label such as New York (JFK)"""
+        match = AIRPORT_CODE_RE.search(label or '')
+        return match.group(1).upper() if match else None
+
 class Airline(models.Model):
     """Model to store airline information"""
     name = models.CharField(max_length=100, unique=True)
@@ -86,4 +347,34 @@ class Airline(models.Model):
         ordering = ['name']
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class RoutePopularity(models.Model):
+    """Route ranking by recent bookings and searches, rebuilt by refresh_route_popularity"""
+    origin = models.CharField(max_length=100)
+    destination = models.CharField(max_length=100)
+    bookings = models.PositiveIntegerField(default=0)
+    searches = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-score']
+        verbose_name_plural = 'route popularity'
+        constraints = [
+            models.UniqueConstraint(fields=['origin', 'destination'], name='unique_route_popularity'),
+        ]
+        indexes = [
+            models.Index(fields=['-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.origin} to {self.destination} ({self.score:g})"
+
+class FlightSearchDocument(models.Model):
+    """Text admin flight search runs against, mirrored into a full-text index (see flights.fulltext)"""
+    flight = models.OneToOneField(Flight, on_delete=models.CASCADE, related_name='search_document')
+    text = models.TextField()
+
+    def __str__(self):
+        return f"Search document for {self.flight_id}"
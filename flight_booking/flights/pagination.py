@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator, newest first, with cursors to its neighbours"""
+
+    def __init__(self, object_list, has_next, has_previous, count=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.count = count
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.has_next else ''
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.has_previous else ''
+
+
+def encode_cursor(obj):
+    data = json.dumps([obj.created_at.isoformat(), str(obj.pk)])
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, pk) from a cursor, or None when it is missing or malformed"""
+    try:
+        created_at, pk = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), pk
+    except (TypeError, ValueError):
+        return None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset newest first by (created_at, id) cursors instead of
+    page numbers.
+
+    Each page is one indexed range query for per_page + 1 rows; the bound
+    on created_at alone lets the index seek straight to the cursor, so a
+    deep page costs the same as the first and no COUNT runs on the way. With
+    count=True the page also carries an approximate total: the queryset's
+    COUNT, cached for PAGINATION_COUNT_CACHE_TIMEOUT seconds.
+    """
+
+    def __init__(self, queryset, per_page, count=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count = count
+
+    def get_page(self, after=None, before=None):
+        """The page after (or before) a cursor; the first page for a missing or bad cursor"""
+        after, before = self._decode(after), self._decode(before)
+        queryset = self.queryset
+        if before:
+            created_at, pk = before
+            queryset = queryset.filter(Q(created_at__gt=created_at) | Q(pk__gt=pk), created_at__gte=created_at)
+            rows = list(queryset.order_by('created_at', 'pk')[:self.per_page + 1])
+            page = KeysetPage(rows[:self.per_page][::-1], has_next=True, has_previous=len(rows) > self.per_page)
+        else:
+            if after:
+                created_at, pk = after
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(pk__lt=pk), created_at__lte=created_at)
+            rows = list(queryset.order_by('-created_at', '-pk')[:self.per_page + 1])
+            page = KeysetPage(rows[:self.per_page], has_next=len(rows) > self.per_page, has_previous=bool(after))
+        if self.count:
+            page.count = self.approximate_count()
+        return page
+
+    def _decode(self, cursor):
+        decoded = decode_cursor(cursor or '')
+        if decoded is None:
+            return None
+        try:
+            return decoded[0], self.queryset.model._meta.pk.to_python(decoded[1])
+        except ValidationError:
+            return None
+
+    def approximate_count(self):
+        try:
+            sql = str(self.queryset.order_by().query)
+        except EmptyResultSet:
+            return 0
+        key = 'pagination:count:' + hashlib.md5(sql.encode()).hexdigest()
+        return cache.get_or_set(key, self.queryset.count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
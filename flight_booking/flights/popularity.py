@@ -0,0 +1,127 @@
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Flight, RoutePopularity
+
+POPULAR_PLACES_KEY = 'flights:popular-places'
+POPULAR_PLACES_LIMIT = 10
+
+# A booking counts as much as this many searches
+BOOKING_WEIGHT = 10
+
+# Searches are buffered per process and written once this many are pending
+SEARCH_FLUSH_THRESHOLD = 100
+
+_pending_searches = Counter()
+_pending_lock = threading.Lock()
+
+
+def record_search(flights):
+    """Count a search against every route that appeared in its results"""
+    routes = {(flight.origin, flight.destination) for flight in flights}
+    if not routes:
+        return
+    with _pending_lock:
+        _pending_searches.update(routes)
+        if sum(_pending_searches.values()) < SEARCH_FLUSH_THRESHOLD:
+            return
+        pending = dict(_pending_searches)
+        _pending_searches.clear()
+    _write_search_counts(pending)
+
+
+def flush_search_counts():
+    """Write this process's buffered search counts to RoutePopularity"""
+    with _pending_lock:
+        pending = dict(_pending_searches)
+        _pending_searches.clear()
+    _write_search_counts(pending)
+
+
+def _write_search_counts(pending):
+    for (origin, destination), searches in pending.items():
+        updated = RoutePopularity.objects.filter(origin=origin, destination=destination).update(
+            searches=F('searches') + searches)
+        if not updated:
+            RoutePopularity.objects.get_or_create(
+                origin=origin, destination=destination, defaults={'searches': searches})
+
+
+def refresh_route_popularity(days=30, decay=0.5):
+    """
+    Rebuild RoutePopularity for every route with upcoming active flights.
+
+    Bookings are counted over the last `days` days. Search counts are
+    multiplied by `decay` on every refresh, so older searches fade out.
+    Returns the number of routes ranked.
+    """
+    from bookings.models import Booking
+
+    flush_search_counts()
+    today = timezone.localdate()
+    since = timezone.now() - timedelta(days=days)
+
+    routes = Flight.objects.filter(is_active=True, departure_date__gte=today).order_by().values_list(
+        'origin', 'destination').distinct()
+    bookings = {
+        (row['flight__origin'], row['flight__destination']): row['bookings']
+        for row in Booking.objects.filter(status__in=['confirmed', 'completed'], created_at__gte=since)
+        .order_by().values('flight__origin', 'flight__destination').annotate(bookings=Count('id'))
+    }
+    searches = {
+        (origin, destination): count
+        for origin, destination, count in RoutePopularity.objects.values_list('origin', 'destination', 'searches')
+    }
+
+    rows = []
+    for route in routes:
+        route_searches = int(searches.get(route, 0) * decay)
+        route_bookings = bookings.get(route, 0)
+        rows.append(RoutePopularity(
+            origin=route[0], destination=route[1], bookings=route_bookings, searches=route_searches,
+            score=route_bookings * BOOKING_WEIGHT + route_searches,
+        ))
+
+    started = timezone.now()
+    with transaction.atomic():
+        RoutePopularity.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['origin', 'destination'],
+            update_fields=['bookings', 'searches', 'score', 'refreshed_at'],
+        )
+        RoutePopularity.objects.filter(refreshed_at__lt=started).delete()
+
+    cache.set(POPULAR_PLACES_KEY, _rank_places(rows), settings.POPULAR_PLACES_CACHE_TIMEOUT)
+    return len(rows)
+
+
+def _rank_places(routes):
+    origins, destinations = Counter(), Counter()
+    for route in routes:
+        origins[route.origin] += route.score
+        destinations[route.destination] += route.score
+    return {
+        'origins': [place for place, _ in origins.most_common(POPULAR_PLACES_LIMIT)],
+        'destinations': [place for place, _ in destinations.most_common(POPULAR_PLACES_LIMIT)],
+    }
+
+
+def get_popular_places():
+    """
+    Return the most popular origins and destinations.
+
+    Served from the cache; on a miss the ranking is read from the
+    RoutePopularity table in one query.
+    """
+    places = cache.get(POPULAR_PLACES_KEY)
+    if places is None:
+        routes = RoutePopularity.objects.only('origin', 'destination', 'score')[:POPULAR_PLACES_LIMIT * 10]
+        places = _rank_places(routes)
+        cache.set(POPULAR_PLACES_KEY, places, settings.POPULAR_PLACES_CACHE_TIMEOUT)
+    return places
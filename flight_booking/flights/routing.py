@@ -0,0 +1,217 @@
+import heapq
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import date_scope, get_generation, make_key
+from .models import Airport, Flight
+from .search import normalize_place
+
+MIN_CONNECTION = timedelta(minutes=45)
+MAX_CONNECTION = timedelta(hours=6)
+MAX_LEGS = 3
+MAX_ITINERARIES = 10
+
+# Departure-date graphs kept in memory per process
+GRAPH_CACHE_SIZE = 14
+
+# One flight in a graph: enough to route on without touching the ORM. Times
+# are aware, in the timezone of the airport they happen at, so differences
+# and comparisons are absolute while .time() still reads the local clock.
+Leg = namedtuple('Leg', ['departs_at', 'arrives_at', 'origin', 'destination', 'price', 'seats', 'stops',
+                         'flight_id'])
+
+
+class Itinerary(namedtuple('Itinerary', ['flights', 'departs_at', 'arrives_at', 'total_price'])):
+    @property
+    def duration(self):
+        return self.arrives_at - self.departs_at
+
+    @property
+    def connections(self):
+        return [flight.destination for flight in self.flights[:-1]]
+
+
+def _node(code, label):
+    """Route on airport codes, falling back to the label for unlinked flights"""
+    return code or normalize_place(label)
+
+
+class FlightGraph:
+    """Active flights departing on one date, grouped by origin and sorted by departure"""
+
+    def __init__(self, legs, labels=None):
+        by_origin = defaultdict(list)
+        for leg in sorted(legs):
+            by_origin[leg.origin].append(leg)
+        self.legs = dict(by_origin)
+        self.departures = {origin: [leg.departs_at for leg in legs] for origin, legs in self.legs.items()}
+        # node -> normalized labels of flights using it, for unresolved searches
+        self.labels = labels or {}
+
+    @classmethod
+    def load(cls, departure_date):
+        rows = Flight.objects.filter(departure_date=departure_date, is_active=True).values_list(
+            'origin_airport__code', 'origin_airport__timezone', 'origin',
+            'destination_airport__code', 'destination_airport__timezone', 'destination',
+            'departure_date', 'departure_time', 'arrival_date', 'arrival_time',
+            'price', 'available_seats', 'stops', 'id',
+        ).order_by()
+        legs, labels, zones = [], defaultdict(set), {}
+
+        def zone(name):
+            if name not in zones:
+                zones[name] = Airport.zone_for(Airport(timezone=name) if name else None)
+            return zones[name]
+
+        for (origin_code, origin_zone, origin, destination_code, destination_zone, destination,
+             dep_date, dep_time, arr_date, arr_time, price, seats, stops, flight_id) in rows:
+            origin_node, destination_node = _node(origin_code, origin), _node(destination_code, destination)
+            labels[origin_node].add(normalize_place(origin))
+            labels[destination_node].add(normalize_place(destination))
+            legs.append(Leg(datetime.combine(dep_date, dep_time, tzinfo=zone(origin_zone)),
+                            datetime.combine(arr_date, arr_time, tzinfo=zone(destination_zone)),
+                            origin_node, destination_node, price, seats, stops, flight_id))
+        return cls(legs, dict(labels))
+
+    def departing(self, origin, earliest, latest):
+        """Legs leaving origin between earliest and latest inclusive"""
+        times = self.departures.get(origin)
+        if not times:
+            return []
+        return self.legs[origin][bisect_left(times, earliest):bisect_right(times, latest)]
+
+
+_graphs = OrderedDict()
+_graphs_lock = threading.Lock()
+
+
+def get_graph(departure_date):
+    """
+    Return the FlightGraph for a date from the per-process cache.
+
+    Entries are tied to the date's cache generation, so saving or deleting a
+    flight on that date rebuilds its graph on next use.
+    """
+    generation = get_generation(date_scope(departure_date))
+    with _graphs_lock:
+        cached = _graphs.get(departure_date)
+        if cached and cached[0] == generation:
+            _graphs.move_to_end(departure_date)
+            return cached[1]
+    graph = FlightGraph.load(departure_date)
+    with _graphs_lock:
+        _graphs[departure_date] = (generation, graph)
+        _graphs.move_to_end(departure_date)
+        while len(_graphs) > GRAPH_CACHE_SIZE:
+            _graphs.popitem(last=False)
+    return graph
+
+
+def find_connections(origin, destination, departure_date, passengers,
+                     origin_codes=None, destination_codes=None, order_by='duration', max_price=None,
+                     max_duration=None, depart_after=None, depart_before=None, max_stops=None):
+    """
+    Return up to MAX_ITINERARIES connecting itineraries of 2 to MAX_LEGS legs.
+
+    Runs a best-first search over the departure date's graph (and the next
+    day's, for overnight connections), ordered by total duration, total
+    price or departure. Each layover must last between MIN_CONNECTION and
+    MAX_CONNECTION. The filters match those of search_flights, applied to
+    the whole itinerary: total price, total minutes, the first departure,
+    and stops counting each connection. The search stops after
+    CONNECTION_SEARCH_TIME_BUDGET seconds and returns what it has found so far.
+    """
+    if max_stops is not None and max_stops < 1:
+        return []
+    next_date = departure_date + timedelta(days=1)
+    limits = (max_price, max_duration, depart_after, depart_before, max_stops)
+    key = make_key('connections', date_scope(departure_date),
+                   normalize_place(origin), normalize_place(destination),
+                   tuple(origin_codes or ()), tuple(destination_codes or ()),
+                   departure_date, passengers, order_by, limits, get_generation(date_scope(next_date)))
+    itineraries = cache.get(key)
+    if itineraries is not None:
+        return itineraries
+
+    graphs = [get_graph(departure_date), get_graph(next_date)]
+    origins = _match_nodes(graphs[:1], origin, origin_codes)
+    destinations = _match_nodes(graphs, destination, destination_codes)
+    if not origins or not destinations:
+        return []
+
+    def cost(legs):
+        if order_by == 'price':
+            return sum(leg.price for leg in legs)
+        if order_by == 'departure':
+            return legs[0].departs_at
+        return legs[-1].arrives_at - legs[0].departs_at
+
+    longest = timedelta(minutes=max_duration) if max_duration is not None else None
+
+    def allowed(legs):
+        # Every limit only grows as legs are added, so a path over one is pruned.
+        return ((max_price is None or sum(leg.price for leg in legs) <= max_price) and
+                (longest is None or legs[-1].arrives_at - legs[0].departs_at <= longest) and
+                (max_stops is None or len(legs) - 1 + sum(leg.stops for leg in legs) <= max_stops))
+
+    def departs_in_window(leg):
+        return ((depart_after is None or leg.departs_at.time() >= depart_after) and
+                (depart_before is None or leg.departs_at.time() <= depart_before))
+
+    deadline = time.monotonic() + settings.CONNECTION_SEARCH_TIME_BUDGET
+    counter = 0
+    heap = []
+    for node in origins:
+        for leg in graphs[0].legs.get(node, ()):
+            if (leg.seats >= passengers and leg.destination not in origins and departs_in_window(leg)
+                    and allowed((leg,))):
+                heap.append((cost((leg,)), counter, (leg,)))
+                counter += 1
+    heapq.heapify(heap)
+
+    found = []
+    while heap and len(found) < MAX_ITINERARIES and time.monotonic() < deadline:
+        _, _, legs = heapq.heappop(heap)
+        last = legs[-1]
+        if last.destination in destinations:
+            if len(legs) > 1:
+                found.append(legs)
+            continue
+        if len(legs) == MAX_LEGS:
+            continue
+        visited = {leg.origin for leg in legs}
+        for graph in graphs:
+            for leg in graph.departing(last.destination, last.arrives_at + MIN_CONNECTION,
+                                       last.arrives_at + MAX_CONNECTION):
+                if leg.seats >= passengers and leg.destination not in visited:
+                    path = legs + (leg,)
+                    if not allowed(path):
+                        continue
+                    heapq.heappush(heap, (cost(path), counter, path))
+                    counter += 1
+
+    flights = Flight.objects.in_bulk([leg.flight_id for legs in found for leg in legs])
+    itineraries = [
+        Itinerary([flights[leg.flight_id] for leg in legs], legs[0].departs_at, legs[-1].arrives_at,
+                  sum(leg.price for leg in legs))
+        for legs in found
+    ]
+    cache.set(key, itineraries, settings.FLIGHT_SEARCH_CACHE_TIMEOUT)
+    return itineraries
+
+
+def _match_nodes(graphs, place, codes):
+    """Graph nodes a searched place refers to: its airport codes, or labels containing it"""
+    if codes:
+        return set(codes)
+    place = normalize_place(place)
+    return {
+        node for graph in graphs for node, labels in graph.labels.items()
+        if any(place in label for label in labels)
+    }
@@ -0,0 +1,211 @@
+import heapq
+from collections import namedtuple
+from datetime import timedelta
+from itertools import product
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Min, Q, Sum, Window
+from django.db.models.functions import RowNumber
+
+from .cache import date_scope, get_generation, get_generations, make_key
+from .models import Airport, Flight
+
+SORT_ORDERS = {
+    'departure': ('departure_time', 'id'),
+    'price': ('price', 'departure_time', 'id'),
+    'duration': ('duration_minutes', 'departure_time', 'id'),
+}
+
+# Largest number of days either side of the requested date in a fare calendar
+FARE_CALENDAR_MAX_DAYS = 15
+
+# Cheapest flights kept per leg before pairing, and pairs returned
+ROUND_TRIP_CANDIDATES_PER_LEG = 10
+ROUND_TRIP_RESULTS = 20
+
+class RoundTrip(namedtuple('RoundTrip', ['outbound', 'inbound', 'total_price'])):
+    @property
+    def legs(self):
+        return (self.outbound, self.inbound)
+
+
+# How round trip pairs are ordered for each sort
+ROUND_TRIP_ORDERS = {
+    'departure': lambda trip: (trip.outbound.departure_time, trip.inbound.departure_time, trip.total_price),
+    'price': lambda trip: (trip.total_price, trip.outbound.departure_time, trip.inbound.departure_time),
+    'duration': lambda trip: (trip.outbound.duration_minutes + trip.inbound.duration_minutes, trip.total_price),
+}
+
+
+def normalize_place(value):
+    """Normalize a user-typed place so equivalent searches share a cache entry"""
+    return ' '.join(value.split()).casefold()
+
+
+def resolve_airport_codes(term):
+    """
+    Resolve a user-typed place to the airport codes it refers to.
+
+    Accepts a code ("JFK"), a label ("New York (JFK)"), an airport name or
+    a city, so "New York" resolves to every airport in that city. Returns a
+    sorted list of codes, empty when nothing matches.
+    """
+    term = ' '.join(term.split())
+    key = make_key('airports', 'airports', normalize_place(term))
+    codes = cache.get(key)
+    if codes is None:
+        code = Airport.code_from_label(term)
+        if code:
+            lookup = Q(code=code)
+        else:
+            lookup = Q(code__iexact=term) | Q(city__iexact=term) | Q(name__iexact=term)
+        codes = sorted(Airport.objects.filter(lookup, is_active=True).values_list('code', flat=True))
+        cache.set(key, codes, None)
+    return codes
+
+
+def route_lookup(origin, destination, origin_codes=None, destination_codes=None):
+    """
+    Return a (cache key part, Q) pair matching flights on a route.
+
+    When both ends resolved to airport codes the match is an equality
+    lookup on the airport foreign keys; otherwise it falls back to matching
+    the free-text labels.
+    """
+    if origin_codes and destination_codes:
+        route = (tuple(origin_codes), tuple(destination_codes))
+        lookup = Q(origin_airport__code__in=origin_codes,
+                   destination_airport__code__in=destination_codes)
+    else:
+        route = (normalize_place(origin), normalize_place(destination))
+        lookup = Q(origin__icontains=route[0], destination__icontains=route[1])
+    return route, lookup
+
+
+def filter_flights(flights, max_price=None, max_duration=None, depart_after=None,
+                   depart_before=None, max_stops=None):
+    """Narrow a Flight queryset by price, duration in minutes, departure window and stops"""
+    if max_price is not None:
+        flights = flights.filter(price__lte=max_price)
+    if max_duration is not None:
+        flights = flights.filter(duration_minutes__lte=max_duration)
+    if depart_after is not None:
+        flights = flights.filter(departure_time__gte=depart_after)
+    if depart_before is not None:
+        flights = flights.filter(departure_time__lte=depart_before)
+    if max_stops is not None:
+        flights = flights.filter(stops__lte=max_stops)
+    return flights
+
+
+def search_flights(origin, destination, departure_date, passengers,
+                   origin_codes=None, destination_codes=None, sort='departure', **filters):
+    """
+    Return active flights for a one-way search, cached per normalized query.
+
+    Filters are those accepted by filter_flights; sorting and filtering both
+    happen in SQL.
+    """
+    route, lookup = route_lookup(origin, destination, origin_codes, destination_codes)
+    key = make_key('search', date_scope(departure_date), route, departure_date, passengers,
+                   sort, sorted(filters.items()))
+
+    flights = cache.get(key)
+    if flights is None:
+        flights = list(filter_flights(Flight.objects.filter(
+            lookup,
+            departure_date=departure_date,
+            available_seats__gte=passengers,
+            is_active=True
+        ), **filters).order_by(*SORT_ORDERS.get(sort, SORT_ORDERS['departure'])))
+        cache.set(key, flights, settings.FLIGHT_SEARCH_CACHE_TIMEOUT)
+    return flights
+
+
+def search_round_trip(origin, destination, departure_date, return_date, passengers,
+                      origin_codes=None, destination_codes=None, sort='price', **filters):
+    """
+    Return RoundTrip pairs for a search, by default cheapest total price first.
+
+    Both legs are fetched in a single query and split by date. A window
+    function keeps only the ROUND_TRIP_CANDIDATES_PER_LEG best flights of
+    each leg for the sort order, which bounds the rows read and the pairs
+    built on busy routes. Filters are those accepted by filter_flights and
+    apply to each leg; sort orders pairs by total price, by departure of
+    the outbound then the inbound leg, or by total duration.
+    """
+    route, outbound_lookup = route_lookup(origin, destination, origin_codes, destination_codes)
+    _, inbound_lookup = route_lookup(destination, origin, destination_codes, origin_codes)
+    sort = sort if sort in SORT_ORDERS else 'price'
+    key = make_key('round-trip', date_scope(departure_date), route, departure_date, return_date,
+                   passengers, sort, sorted(filters.items()), get_generation(date_scope(return_date)))
+
+    trips = cache.get(key)
+    if trips is None:
+        flights = filter_flights(Flight.objects.filter(
+            (outbound_lookup & Q(departure_date=departure_date)) |
+            (inbound_lookup & Q(departure_date=return_date)),
+            available_seats__gte=passengers,
+            is_active=True
+        ), **filters).annotate(leg_rank=Window(
+            RowNumber(),
+            partition_by=F('departure_date'),
+            order_by=[F(field).asc() for field in SORT_ORDERS[sort]],
+        )).filter(leg_rank__lte=ROUND_TRIP_CANDIDATES_PER_LEG)
+
+        outbound, inbound = [], []
+        for flight in flights:
+            (outbound if flight.departure_date == departure_date else inbound).append(flight)
+
+        trips = heapq.nsmallest(
+            ROUND_TRIP_RESULTS,
+            (RoundTrip(out, back, out.price + back.price) for out, back in product(outbound, inbound)),
+            key=ROUND_TRIP_ORDERS[sort],
+        )
+        cache.set(key, trips, settings.FLIGHT_SEARCH_CACHE_TIMEOUT)
+    return trips
+
+
+def fare_calendar(origin, destination, center_date, days, passengers,
+                  origin_codes=None, destination_codes=None):
+    """
+    Return the cheapest fare and seat availability for each day around a date.
+
+    Covers days either side of center_date with one grouped aggregate over
+    Flight. Days without a bookable flight are included with no price. The
+    result is cached per route and window, keyed on the generation of every
+    day in it so a price or seat change on any of those days refreshes it.
+    """
+    start = center_date - timedelta(days=days)
+    window = [start + timedelta(days=offset) for offset in range(2 * days + 1)]
+    route, lookup = route_lookup(origin, destination, origin_codes, destination_codes)
+    key = make_key('fare-calendar', date_scope(center_date), route, start, len(window), passengers,
+                   get_generations(date_scope(day) for day in window))
+
+    calendar = cache.get(key)
+    if calendar is None:
+        fares = {
+            row['departure_date']: row
+            for row in Flight.objects.filter(
+                lookup,
+                departure_date__range=(window[0], window[-1]),
+                available_seats__gte=passengers,
+                is_active=True
+            ).order_by().values('departure_date').annotate(
+                min_price=Min('price'),
+                flights=Count('id'),
+                seats=Sum('available_seats'),
+            )
+        }
+        calendar = [
+            {
+                'date': day,
+                'min_price': fares[day]['min_price'] if day in fares else None,
+                'flights': fares[day]['flights'] if day in fares else 0,
+                'seats': fares[day]['seats'] if day in fares else 0,
+            }
+            for day in window
+        ]
+        cache.set(key, calendar, settings.FLIGHT_SEARCH_CACHE_TIMEOUT)
+    return calendar
@@ -0,0 +1,144 @@
+import re
+
+# Seat letters per row for known aircraft; spaces mark the aisles.
+SEAT_LAYOUTS = {
+    'Airbus A220': 'AB CDE',
+    'Airbus A320': 'ABC DEF',
+    'Airbus A321': 'ABC DEF',
+    'Airbus A330': 'AB DEFG HK',
+    'Airbus A350': 'ABC DEF GHK',
+    'Airbus A380': 'ABC DEFG HJK',
+    'Boeing 737-800': 'ABC DEF',
+    'Boeing 757-200': 'ABC DEF',
+    'Boeing 767-300': 'AB CDE FG',
+    'Boeing 777-300ER': 'ABC DEFG HJK',
+    'Boeing 787-9': 'ABC DEF GHK',
+    'Embraer E175': 'AB CD',
+}
+
+SEAT_LABEL_RE = re.compile(r'^\s*(\d{1,3})\s*([A-Za-z])\s*$')
+
+
+def layout_for(aircraft, total_seats):
+    """Seat layout for an aircraft, guessed from the cabin size when unknown"""
+    if aircraft in SEAT_LAYOUTS:
+        return SEAT_LAYOUTS[aircraft]
+    if total_seats <= 100:
+        return 'AB CD'
+    if total_seats <= 250:
+        return 'ABC DEF'
+    return 'ABC DEFG HJK'
+
+
+class SeatMap:
+    """
+    Per-seat inventory of a flight as a bitmap, one bit per seat.
+
+    Seat i sits in row i // width + 1 at letter i % width, so the whole map
+    for a 500-seat aircraft fits in 63 bytes on the Flight row.
+    """
+
+    def __init__(self, layout, total_seats, bitmap=b''):
+        self.blocks = layout.split()
+        self.letters = ''.join(self.blocks)
+        self.width = len(self.letters)
+        self.total_seats = total_seats
+        size = (total_seats + 7) // 8
+        self.bits = bytearray(bytes(bitmap or b'')[:size]).ljust(size, b'\0')
+
+    @classmethod
+    def for_flight(cls, flight, bitmap=None):
+        bitmap = flight.seat_map if bitmap is None else bitmap
+        return cls(layout_for(flight.aircraft, flight.total_seats), flight.total_seats, bitmap)
+
+    def to_bytes(self):
+        return bytes(self.bits)
+
+    def label(self, index):
+        row, column = divmod(index, self.width)
+        return f'{row + 1}{self.letters[column]}'
+
+    def index(self, label):
+        """Seat index for a label such as "12A"; raises ValueError for unknown seats"""
+        match = SEAT_LABEL_RE.match(label or '')
+        letter = match.group(2).upper() if match else ''
+        if not match or letter not in self.letters:
+            raise ValueError(f'Seat {label} does not exist.')
+        index = (int(match.group(1)) - 1) * self.width + self.letters.index(letter)
+        if not 0 <= index < self.total_seats:
+            raise ValueError(f'Seat {label} does not exist.')
+        return index
+
+    def indexes(self, labels):
+        """Indexes of the labels that name seats on this map, skipping any that do not"""
+        indexes = []
+        for label in labels:
+            try:
+                indexes.append(self.index(label))
+            except ValueError:
+                continue
+        return indexes
+
+    def is_taken(self, index):
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def take(self, indexes):
+        for index in indexes:
+            self.bits[index >> 3] |= 1 << (index & 7)
+
+    def release(self, indexes):
+        for index in indexes:
+            self.bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def choose(self, count, requested=()):
+        """
+        Pick count seats: the requested labels first, the rest auto-assigned.
+
+        Auto-assigned seats are kept together when possible: a run within
+        one block of a row, then any seats in one row, then the first free
+        seats. Returns None when a requested seat is taken or too few remain.
+        """
+        chosen = [self.index(label) for label in requested]
+        if len(set(chosen)) != len(chosen) or any(self.is_taken(index) for index in chosen):
+            return None
+        extra = self._adjacent_free(count - len(chosen), set(chosen))
+        return None if extra is None else chosen + extra
+
+    def _adjacent_free(self, count, exclude):
+        if count <= 0:
+            return []
+
+        def free(index):
+            return index < self.total_seats and index not in exclude and not self.is_taken(index)
+
+        rows = range((self.total_seats + self.width - 1) // self.width)
+        for row in rows:
+            start = row * self.width
+            for block in self.blocks:
+                run = []
+                for index in range(start, start + len(block)):
+                    run = run + [index] if free(index) else []
+                    if len(run) == count:
+                        return run
+                start += len(block)
+        for row in rows:
+            seats = [index for index in range(row * self.width, (row + 1) * self.width) if free(index)]
+            if len(seats) >= count:
+                return seats[:count]
+        seats = [index for index in range(self.total_seats) if free(index)][:count]
+        return seats if len(seats) == count else None
+
+    def rows(self):
+        """Seats for display: a list of rows, each a list of blocks of (label, taken)"""
+        rows = []
+        for start in range(0, self.total_seats, self.width):
+            blocks, index = [], start
+            for block in self.blocks:
+                seats = []
+                for _ in block:
+                    if index < self.total_seats:
+                        seats.append((self.label(index), self.is_taken(index)))
+                    index += 1
+                blocks.append(seats)
+            rows.append(blocks)
+        return rows
@@ -0,0 +1,83 @@
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete import city_index
+from .cache import bump_generation, date_scope, invalidate_flight
+from .fulltext import index_flights
+from .models import Airport, Flight
+
+
+def _update_city_index(instance, created=False, deleted=False):
+    """Move the flight's contribution in the autocomplete index to its new labels"""
+    if not city_index.is_built:
+        return
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None and not created and not deleted:
+        # Saved without being loaded first, so its old labels are unknown.
+        city_index.invalidate()
+        return
+    if loaded is None:
+        loaded = {} if created else {
+            'is_active': instance.is_active,
+            'origin': instance.origin,
+            'destination': instance.destination,
+        }
+    if loaded.get('is_active'):
+        if 'origin' not in loaded or 'destination' not in loaded:
+            city_index.invalidate()
+            return
+        city_index.remove_flight(loaded['origin'], loaded['destination'])
+    if instance.is_active and not deleted:
+        city_index.add_flight(instance.origin, instance.destination)
+
+
+@receiver(post_save, sender=Flight)
+def flight_saved(sender, instance, created, **kwargs):
+    """Clear cached searches and patch the autocomplete and search indexes after a save"""
+    invalidate_flight(instance)
+    _update_city_index(instance, created=created)
+    index_flights([instance])
+    loaded = getattr(instance, '_loaded_values', None)
+    if not created and (loaded is None or loaded.get('flight_number') != instance.flight_number):
+        # Booking documents include the flight number.
+        from bookings.fulltext import index_bookings_on_commit
+        index_bookings_on_commit(instance.bookings.values_list('id', flat=True))
+    instance._loaded_values = {
+        field.attname: field.value_from_object(instance)
+        for field in instance._meta.concrete_fields
+    }
+
+
+@receiver(post_delete, sender=Flight)
+def flight_deleted(sender, instance, **kwargs):
+    invalidate_flight(instance)
+    _update_city_index(instance, deleted=True)
+
+
+@receiver(post_save, sender=Airport)
+def airport_saved(sender, instance, created, **kwargs):
+    """Link flights whose labels name this airport but were saved before it existed"""
+    code_suffix = f'({instance.code})'
+    unlinked = Flight.objects.filter(
+        Q(origin_airport=None, origin__iendswith=code_suffix) |
+        Q(destination_airport=None, destination__iendswith=code_suffix)
+    )
+    for departure_date in unlinked.order_by().values_list('departure_date', flat=True).distinct():
+        bump_generation(date_scope(departure_date))
+    Flight.objects.filter(origin_airport=None, origin__iendswith=code_suffix).update(origin_airport=instance)
+    Flight.objects.filter(destination_airport=None, destination__iendswith=code_suffix).update(
+        destination_airport=instance)
+    bump_generation('airports')
+
+    if created and instance.is_active:
+        city_index.add_airport(instance.city, instance.code)
+    else:
+        city_index.invalidate()
+
+
+@receiver(post_delete, sender=Airport)
+def airport_deleted(sender, instance, **kwargs):
+    bump_generation('airports')
+    if instance.is_active:
+        city_index.remove_airport(instance.city, instance.code)
@@ -1,17 +1,41 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.contrib.auth.decorators import login_required, user_passes_test
+from django.contrib.auth.decorators import user_passes_test
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Count, Max, Q, prefetch_related_objects
 from django.http import JsonResponse
-from datetime import date
+from django.utils import timezone
+from django.views.decorators.http import condition
+from datetime import timedelta
+import hashlib
+from bookings.services import cancel_flights
+from .autocomplete import city_index
+from .fulltext import match_flights
 from .models import Flight
-from .forms import FlightSearchForm, FlightForm
+from .pagination import KeysetPaginator
+from .forms import FareCalendarForm, FlightSearchAPIForm, FlightSearchForm, FlightForm
+from .popularity import get_popular_places, record_search
+from .routing import find_connections
+from .seatmap import SeatMap
+from .search import fare_calendar, route_lookup, search_flights, search_round_trip
+
+# Days of daily sales and number of top routes shown on the admin dashboard
+DASHBOARD_SALES_DAYS = 7
+DASHBOARD_TOP_ROUTES = 5
+
+# Fields returned for each flight by the JSON search API
+API_FLIGHT_FIELDS = [
+    'id', 'airline', 'flight_number', 'origin', 'destination',
+    'departure_date', 'departure_time', 'arrival_date', 'arrival_time',
+    'duration', 'duration_minutes', 'price', 'available_seats', 'stops', 'layovers',
+]
 
 def home(request):
     """Home page with flight search"""
     form = FlightSearchForm()
     flights = []
+    round_trips = []
+    connections = []
     search_performed = False
     
     if request.method == 'GET' and any(key in request.GET for key in ['origin', 'destination', 'departure_date']):
@@ -23,56 +47,144 @@ def home(request):
             departure_date = form.cleaned_data['departure_date']
             passengers = form.cleaned_data['passengers']
             
+            codes = {
+                'origin_codes': form.cleaned_data.get('origin_codes'),
+                'destination_codes': form.cleaned_data.get('destination_codes'),
+            }
+            
+            filters = form.search_filters()
+            limits = {key: value for key, value in filters.items() if key != 'sort'}
+            # With no sort chosen, round trips stay cheapest first and connections shortest first
+            sort = form.cleaned_data.get('sort')
+            
             # Search for flights
-            flights = Flight.objects.filter(
-                origin__icontains=origin,
-                destination__icontains=destination,
-                departure_date=departure_date,
-                available_seats__gte=passengers,
-                is_active=True
-            ).order_by('departure_time')
-    
-    # Get popular destinations for autocomplete
-    popular_destinations = Flight.objects.filter(
-        is_active=True,
-        departure_date__gte=date.today()
-    ).values_list('destination', flat=True).distinct()[:10]
-    
-    popular_origins = Flight.objects.filter(
-        is_active=True,
-        departure_date__gte=date.today()
-    ).values_list('origin', flat=True).distinct()[:10]
+            if form.cleaned_data['trip_type'] == 'round-trip':
+                round_trips = search_round_trip(
+                    origin, destination, departure_date, form.cleaned_data['return_date'],
+                    passengers, **codes, sort=sort or 'price', **limits
+                )
+            else:
+                flights = search_flights(origin, destination, departure_date, passengers,
+                                         **codes, **filters)
+                record_search(flights)
+                flights = Paginator(flights, 20).get_page(request.GET.get('page'))
+                prefetch_related_objects(flights.object_list, 'layover_stops')
+                connections = find_connections(origin, destination, departure_date, passengers,
+                                               **codes, order_by=sort or 'duration', **limits)
+    
+    # Popular places for autocomplete, precomputed by refresh_route_popularity
+    popular = get_popular_places()
     
     context = {
         'form': form,
         'flights': flights,
+        'round_trips': round_trips,
+        'connections': connections,
         'search_performed': search_performed,
-        'popular_destinations': popular_destinations,
-        'popular_origins': popular_origins,
+        'popular_destinations': popular['destinations'],
+        'popular_origins': popular['origins'],
     }
     return render(request, 'flights/home.html', context)
 
+def fare_calendar_view(request):
+    """JSON fare calendar: cheapest price and seats per day around a date"""
+    form = FareCalendarForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    data = form.cleaned_data
+    calendar = fare_calendar(
+        data['origin'], data['destination'], data['date'], data['days'], data['passengers'],
+        origin_codes=data.get('origin_codes'),
+        destination_codes=data.get('destination_codes'),
+    )
+    return JsonResponse({
+        'origin': data['origin'],
+        'destination': data['destination'],
+        'passengers': data['passengers'],
+        'days': calendar,
+    })
+
+def _api_search_queryset(form):
+    data = form.cleaned_data
+    _, lookup = route_lookup(
+        data['origin'], data['destination'],
+        data.get('origin_codes'), data.get('destination_codes'),
+    )
+    return Flight.objects.filter(
+        lookup,
+        departure_date=data['departure_date'],
+        available_seats__gte=data['passengers'],
+        is_active=True
+    )
+
+def _api_search_etag(request):
+    """ETag for a search page, from the newest update and size of its result set"""
+    form = FlightSearchAPIForm(request.GET)
+    if not form.is_valid():
+        return None
+    stats = _api_search_queryset(form).aggregate(last_updated=Max('updated_at'), count=Count('id'))
+    params = sorted(request.GET.items())
+    return hashlib.md5(repr((params, stats['last_updated'], stats['count'])).encode()).hexdigest()
+
+@condition(etag_func=_api_search_etag)
+def api_search(request):
+    """JSON flight search with keyset pagination on (departure_time, id)"""
+    form = FlightSearchAPIForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'errors': form.errors}, status=400)
+    
+    limit = form.cleaned_data['limit']
+    flights = _api_search_queryset(form).order_by('departure_time', 'id')
+    cursor = form.cleaned_data['cursor']
+    if cursor:
+        departure_time, flight_id = cursor
+        flights = flights.filter(
+            Q(departure_time__gt=departure_time) |
+            Q(departure_time=departure_time, id__gt=flight_id)
+        )
+    
+    results = list(flights.values(*API_FLIGHT_FIELDS)[:limit + 1])
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = FlightSearchAPIForm.encode_cursor(results[-1]['departure_time'], results[-1]['id'])
+    
+    return JsonResponse({'results': results, 'next': next_cursor})
+
 def flight_detail(request, flight_id):
     """Flight detail view"""
     flight = get_object_or_404(Flight, id=flight_id, is_active=True)
     return render(request, 'flights/flight_detail.html', {'flight': flight})
 
-@login_required
+def seat_map(request, flight_id):
+    """JSON seat map of a flight, built from its stored bitmap in one row read"""
+    flight = get_object_or_404(Flight.objects.only('aircraft', 'total_seats', 'available_seats', 'seat_map'),
+                               id=flight_id, is_active=True)
+    seats = SeatMap.for_flight(flight)
+    return JsonResponse({
+        'layout': ' '.join(seats.blocks),
+        'available_seats': flight.available_seats,
+        'rows': [[[{'seat': seat, 'taken': taken} for seat, taken in block] for block in row]
+                 for row in seats.rows()],
+    })
+
 def is_admin(user):
     return user.is_admin or user.is_superuser
 
 @user_passes_test(is_admin)
 def admin_dashboard(request):
     """Admin dashboard with overview"""
-    from bookings.models import Booking
-    from django.db.models import Sum, Count
+    from bookings.models import AirlineSales, Booking, DailySales, RouteSales
     
-    # Statistics
-    total_flights = Flight.objects.filter(is_active=True).count()
-    total_bookings = Booking.objects.filter(status='confirmed').count()
-    total_revenue = Booking.objects.filter(status='confirmed').aggregate(
-        total=Sum('total_amount')
-    )['total'] or 0
+    # Statistics, read from the sales rollups rather than the bookings
+    today = timezone.localdate()
+    total_flights = Flight.objects.filter(is_active=True, departure_date__gte=today).count()
+    airline_sales = list(AirlineSales.objects.order_by('-revenue'))
+    total_bookings = sum(sales.bookings for sales in airline_sales)
+    total_revenue = sum(sales.revenue for sales in airline_sales)
+    daily_sales = DailySales.objects.filter(date__gt=today - timedelta(days=DASHBOARD_SALES_DAYS)).order_by('date')
+    top_routes = RouteSales.objects.order_by('-seats')[:DASHBOARD_TOP_ROUTES]
     
     # Recent bookings
     recent_bookings = Booking.objects.select_related('flight', 'user').order_by('-created_at')[:5]
@@ -81,6 +193,9 @@ def admin_dashboard(request):
         'total_flights': total_flights,
         'total_bookings': total_bookings,
         'total_revenue': total_revenue,
+        'airline_sales': airline_sales,
+        'daily_sales': daily_sales,
+        'top_routes': top_routes,
         'recent_bookings': recent_bookings,
     }
     return render(request, 'flights/admin_dashboard.html', context)
@@ -88,22 +203,16 @@ def admin_dashboard(request):
 @user_passes_test(is_admin)
 def admin_flights(request):
     """Admin flight management"""
-    flights = Flight.objects.all().order_by('-created_at')
+    flights = Flight.objects.all()
     
     # Search functionality
     search_query = request.GET.get('search', '')
     if search_query:
-        flights = flights.filter(
-            Q(flight_number__icontains=search_query) |
-            Q(airline__icontains=search_query) |
-            Q(origin__icontains=search_query) |
-            Q(destination__icontains=search_query)
-        )
+        flights = match_flights(flights, search_query)
     
     # Pagination
-    paginator = Paginator(flights, 20)
-    page_number = request.GET.get('page')
-    flights = paginator.get_page(page_number)
+    paginator = KeysetPaginator(flights, 20, count=True)
+    flights = paginator.get_page(request.GET.get('after'), request.GET.get('before'))
     
     context = {
         'flights': flights,
@@ -148,6 +257,18 @@ def admin_flight_edit(request, flight_id):
         'title': 'Edit Flight'
     })
 
+@user_passes_test(is_admin)
+def admin_flights_cancel(request):
+    """Deactivate the selected flights and cancel all their bookings"""
+    if request.method == 'POST':
+        flight_ids = [int(flight_id) for flight_id in request.POST.getlist('flight_ids') if flight_id.isdigit()]
+        if flight_ids:
+            cancelled = cancel_flights(flight_ids)
+            messages.success(request, f'Cancelled {len(flight_ids)} flights and {cancelled} bookings.')
+        else:
+            messages.error(request, 'Select at least one flight to cancel.')
+    return redirect('flights:admin_flights')
+
 @user_passes_test(is_admin)
 def admin_flight_delete(request, flight_id):
     """Delete flight"""
@@ -164,17 +285,6 @@ def autocomplete_cities(request):
     """AJAX endpoint for city autocomplete"""
     term = request.GET.get('term', '')
     if len(term) >= 2:
-        origins = Flight.objects.filter(
-            origin__icontains=term,
-            is_active=True
-        ).values_list('origin', flat=True).distinct()[:10]
-        
-        destinations = Flight.objects.filter(
-            destination__icontains=term,
-            is_active=True
-        ).values_list('destination', flat=True).distinct()[:10]
-        
-        cities = list(set(list(origins) + list(destinations)))
-        return JsonResponse(cities, safe=False)
+        return JsonResponse(city_index.search(term), safe=False)
     
     return JsonResponse([], safe=False)
\ No newline at end of file